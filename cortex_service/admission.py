@@ -0,0 +1,307 @@
+# Pylance strict mode
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from . import deadlines, validation
+from .api_models import DocumentProcessRequest
+from .security import ApiClient
+
+# Number of documents that may be chunked or encoded at the same time.
+MAX_CONCURRENT_WORK: int = int(os.getenv("CORTEX_MAX_CONCURRENT_WORK", "2"))
+# Encoder cost of a single chunk, expressed in character-equivalent work units.
+CHUNK_WORK_UNITS: float = float(os.getenv("CORTEX_CHUNK_WORK_UNITS", "256"))
+# Longest a client can be told to wait; debt beyond what it repays in this
+# time is forgiven.
+MAX_RETRY_AFTER_SECONDS: float = float(
+    os.getenv("CORTEX_MAX_RETRY_AFTER_SECONDS", "300")
+)
+
+THROTTLED_REQUESTS = Counter(
+    "cortex_throttled_requests_total",
+    "Requests rejected because the client's work budget was exhausted.",
+    ["client"],
+)
+ADMITTED_WORK = Counter(
+    "cortex_admitted_work_units_total",
+    "Estimated work units admitted for processing.",
+    ["client"],
+)
+QUEUED_WORK = Gauge(
+    "cortex_scheduler_queued_requests",
+    "Work items waiting for a processing slot.",
+    ["client"],
+)
+THROTTLE_WAIT = Histogram(
+    "cortex_throttle_wait_seconds",
+    "Time batch documents spent waiting for the client's work budget.",
+    ["client"],
+)
+QUEUE_WAIT = Histogram(
+    "cortex_scheduler_wait_seconds",
+    "Time spent waiting for a processing slot.",
+    ["client"],
+)
+
+
+class ThrottledError(Exception):
+    """Raised when a client has no work budget left."""
+
+    def __init__(self, client: ApiClient, retry_after: float) -> None:
+        super().__init__(f"Work budget exhausted for client '{client.name}'.")
+        self.retry_after = retry_after
+
+
+def estimate_work(request: DocumentProcessRequest, stage: str | None = None) -> float:
+    """
+    Estimates the cost of a document as characters plus the chunks that
+    validation will encode, or only the share of `stage` ("chunk" for the
+    characters, "encode" for the chunks) if given.
+    """
+    length = len(request.content)
+    if stage == "chunk":
+        return length
+    strategy = request.chunking_strategy
+    if strategy.name in ("fixed_size", "hierarchical"):
+        # Only the child chunks of a hierarchy are encoded.
+        step = max(strategy.params.chunk_size - strategy.params.chunk_overlap, 1)
+        chunks = math.ceil(length / step)
+    elif strategy.name == "content_defined":
+        chunks = math.ceil(length / max(strategy.params.target_chunk_size, 1))
+    else:
+        chunks = request.content.count("\n\n") + 1
+
+    options = request.validation
+    if options.level == "none":
+        encoded_share = 0.0
+    elif options.level == "sampled":
+        if options.sample_fraction is not None:
+            encoded_share = min(1.0, 2 * options.sample_fraction)
+        else:
+            every = options.sample_every or validation.DEFAULT_SAMPLE_EVERY
+            encoded_share = min(1.0, 2 / every)
+    else:
+        encoded_share = 1.0
+    encoding = chunks * encoded_share * CHUNK_WORK_UNITS
+    return encoding if stage == "encode" else length + encoding
+
+
+class TokenBucket:
+    """
+    A token bucket that may go into debt.
+
+    Work is admitted while the balance is positive and is charged in full, so
+    a single request larger than `burst` is still possible but delays the
+    client's next one accordingly. The debt is capped at what the bucket
+    refills in `max_wait` seconds, which bounds `retry_after`.
+    """
+
+    def __init__(
+        self, rate: float, burst: float, max_wait: float = MAX_RETRY_AFTER_SECONDS
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_debt = rate * max_wait
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def retry_after(self) -> float:
+        """Seconds until the balance is positive again, or 0 if it already is."""
+        self._refill()
+        return 0.0 if self._tokens > 0 else -self._tokens / self.rate + 1e-3
+
+    def consume(self, cost: float) -> None:
+        """Charges `cost` tokens unconditionally, down to the debt cap."""
+        self._refill()
+        self._tokens = max(self._tokens - cost, -self.max_debt)
+
+
+class FairScheduler:
+    """
+    Weighted fair queueing of work across clients.
+
+    Each item gets a virtual start tag, the later of the scheduler's virtual
+    time and the client's previous finish tag, and a finish tag of
+    `start + cost / weight`. Free slots go to the waiting item with the
+    smallest finish tag, and virtual time advances to the start tag of the
+    item taking the slot. Light clients thus overtake a backlog of bulk work,
+    while a bulk client alone still gets all the capacity.
+
+    Waiting items whose deadline passes or that are cancelled leave the queue
+    without taking a slot, so capacity goes to requests that can still succeed.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._running = 0
+        self._virtual_time = 0.0
+        self._last_finish: dict[str, float] = {}
+        self._waiting: list[
+            tuple[float, int, float, asyncio.Future[None], deadlines.Deadline | None]
+        ] = []
+        self._sequence = itertools.count()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        client: ApiClient,
+        cost: float,
+        deadline: deadlines.Deadline | None = None,
+    ) -> AsyncIterator[None]:
+        """
+        Waits for a processing slot and holds it for the enclosed block.
+
+        Raises:
+            WorkAbandonedError: If the deadline passes or the request is
+                cancelled while waiting.
+        """
+        if deadline is not None:
+            deadline.check("queue")
+        start = max(self._virtual_time, self._last_finish.get(client.name, 0.0))
+        finish = start + cost / client.weight
+        self._last_finish[client.name] = finish
+
+        if self._running < self._capacity and not self._waiting:
+            self._running += 1
+            self._virtual_time = start
+        else:
+            await self._wait(client, start, finish, deadline)
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait(
+        self,
+        client: ApiClient,
+        start: float,
+        finish: float,
+        deadline: deadlines.Deadline | None,
+    ) -> None:
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiting, (finish, next(self._sequence), start, future, deadline)
+        )
+        QUEUED_WORK.labels(client.name).inc()
+        queued_at = time.monotonic()
+        try:
+            while not future.done():
+                if deadline is None:
+                    await future
+                    break
+                deadline.check("queue")
+                timeout = min(deadline.remaining(), deadlines.POLL_INTERVAL_SECONDS)
+                await asyncio.wait([future], timeout=max(timeout, 0.0))
+            if future.cancelled() and deadline is not None:
+                # Skipped by _release because the request was abandoned.
+                deadline.check("queue")
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation.
+                self._release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            QUEUED_WORK.labels(client.name).dec()
+            QUEUE_WAIT.labels(client.name).observe(time.monotonic() - queued_at)
+
+    def _release(self) -> None:
+        while self._waiting:
+            _, _, start, future, deadline = heapq.heappop(self._waiting)
+            if future.done():
+                continue
+            if deadline is not None and deadline.abandoned:
+                future.cancel()
+                continue
+            # Hand the slot straight to the next item.
+            self._virtual_time = max(self._virtual_time, start)
+            future.set_result(None)
+            return
+        self._running -= 1
+
+
+SCHEDULER = FairScheduler(MAX_CONCURRENT_WORK)
+_BUCKETS: dict[str, TokenBucket] = {}
+
+
+def _bucket(client: ApiClient) -> TokenBucket:
+    bucket = _BUCKETS.get(client.name)
+    if bucket is None:
+        bucket = _BUCKETS[client.name] = TokenBucket(client.rate, client.burst)
+    return bucket
+
+
+def reserve(client: ApiClient, cost: float) -> None:
+    """
+    Admits and charges `cost` work units against the client's budget.
+
+    Raises:
+        ThrottledError: If the client's budget is exhausted.
+    """
+    bucket = _bucket(client)
+    retry_after = bucket.retry_after()
+    if retry_after > 0:
+        THROTTLED_REQUESTS.labels(client.name).inc()
+        raise ThrottledError(client, retry_after)
+    bucket.consume(cost)
+    ADMITTED_WORK.labels(client.name).inc(cost)
+
+
+async def charge(
+    client: ApiClient,
+    request: DocumentProcessRequest,
+    deadline: deadlines.Deadline | None = None,
+) -> None:
+    """
+    Charges a document that is already part of an admitted request.
+
+    It first waits until the client's budget is positive again, so a
+    streamed batch runs at the client's rate instead of running up debt.
+
+    Raises:
+        WorkAbandonedError: If the deadline passes or the request is
+            cancelled before the document is charged.
+    """
+    bucket = _bucket(client)
+    waited_since = time.monotonic()
+    while (retry_after := bucket.retry_after()) > 0:
+        if deadline is not None:
+            deadline.check("throttle")
+            retry_after = min(
+                retry_after, deadline.remaining(), deadlines.POLL_INTERVAL_SECONDS
+            )
+        await asyncio.sleep(max(retry_after, 0.0))
+    THROTTLE_WAIT.labels(client.name).observe(time.monotonic() - waited_since)
+    if deadline is not None:
+        # Abandoned documents are not charged.
+        deadline.check("queue")
+    cost = estimate_work(request)
+    bucket.consume(cost)
+    ADMITTED_WORK.labels(client.name).inc(cost)
+
+
+def stage_slot(
+    client: ApiClient,
+    request: DocumentProcessRequest,
+    stage: str,
+    deadline: deadlines.Deadline | None = None,
+) -> AbstractAsyncContextManager[None]:
+    """
+    Holds a fairly scheduled processing slot for one stage ("chunk" or
+    "encode") of an already charged document.
+    """
+    return SCHEDULER.slot(client, estimate_work(request, stage), deadline)
@@ -1,7 +1,7 @@
 # Pylance strict mode
 from typing import Any, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 # --- Request Models ---
 
@@ -14,18 +14,76 @@ class ChunkingStrategyParams(BaseModel):
     )
     chunk_overlap: int = Field(100, description="Overlap for fixed_size.")
     min_chunk_size: int = Field(
-        50, description="Min characters for paragraph chunking."
+        50, description="Min characters for paragraph and content_defined chunking."
+    )
+    target_chunk_size: int = Field(
+        1000, description="Average characters per chunk for content_defined."
+    )
+    max_chunk_size: int = Field(
+        4000, description="Max characters per chunk for content_defined."
+    )
+    parent_chunk_size: int = Field(
+        4000,
+        description="Max characters per parent chunk for hierarchical. Child chunks use chunk_size and chunk_overlap.",
     )
 
 
 class ChunkingStrategy(BaseModel):
     """Defines the chunking strategy to be used."""
 
-    name: Literal["fixed_size", "paragraph"] = Field(
+    name: Literal["fixed_size", "paragraph", "hierarchical", "content_defined"] = Field(
         ..., description="The name of the strategy."
     )
     params: ChunkingStrategyParams = Field(default_factory=ChunkingStrategyParams)  # type: ignore
 
+    @model_validator(mode="after")
+    def check_content_defined_sizes(self) -> "ChunkingStrategy":
+        """Rejects content_defined sizes that cannot produce valid chunks."""
+        low = self.params.min_chunk_size
+        target = self.params.target_chunk_size
+        high = self.params.max_chunk_size
+        if self.name == "content_defined" and not 0 < low <= target <= high:
+            raise ValueError(
+                "content_defined requires 0 < min_chunk_size <= target_chunk_size <= max_chunk_size."
+            )
+        return self
+
+
+ValidationLevel = Literal["none", "sampled", "full"]
+ChunkLevel = Literal["parent", "child"]
+
+
+class ValidationOptions(BaseModel):
+    """Controls how much semantic validation is performed."""
+
+    level: ValidationLevel = Field(
+        "full",
+        description="none skips the encoder, sampled scores a subset of adjacent pairs, full scores every pair.",
+    )
+    sample_every: int | None = Field(
+        None,
+        ge=1,
+        description="For sampled: score every k-th adjacent pair. Defaults to 10 if sample_fraction is not set.",
+    )
+    sample_fraction: float | None = Field(
+        None,
+        gt=0,
+        le=1,
+        description="For sampled: score a random fraction of adjacent pairs, seeded by document_id.",
+    )
+
+    @model_validator(mode="after")
+    def check_sampling(self) -> "ValidationOptions":
+        """Rejects sampling parameters that would be silently ignored."""
+        sampling = self.sample_every is not None or self.sample_fraction is not None
+        if sampling and self.level != "sampled":
+            raise ValueError(
+                "sample_every and sample_fraction are only valid with level 'sampled'."
+            )
+        if self.sample_every is not None and self.sample_fraction is not None:
+            raise ValueError("Set at most one of sample_every and sample_fraction.")
+        return self
+
 
 class DocumentProcessRequest(BaseModel):
     """Request body for the /sync endpoint."""
@@ -36,6 +94,11 @@ class DocumentProcessRequest(BaseModel):
         default_factory=dict, description="Arbitrary source metadata."
     )
     chunking_strategy: ChunkingStrategy
+    embedding_model: str | None = Field(
+        None,
+        description="Sentence-transformers model used for validation. Defaults to the service's configured model.",
+    )
+    validation: ValidationOptions = Field(default_factory=ValidationOptions)  # type: ignore
 
 
 # --- Response Models ---
@@ -46,7 +109,7 @@ class ChunkValidation(BaseModel):
 
     similarity_with_next_chunk: float | None = Field(
         None,
-        description="Cosine similarity score with the following chunk. Null for the last chunk.",
+        description="Cosine similarity score with the following chunk of the same level. Null for the last chunk and for pairs skipped by validation.",
     )
 
 
@@ -56,6 +119,20 @@ class ChunkMetadata(BaseModel):
     parent_document_id: str
     original_metadata: dict[str, Any]
     validation: ChunkValidation
+    content_hash: str = Field(
+        ...,
+        description="SHA-256 of the chunk text. Unchanged chunks keep their hash across syncs.",
+    )
+    chunk_level: ChunkLevel | None = Field(
+        None,
+        description="Level of the chunk for hierarchical chunking. Null for other strategies.",
+    )
+    parent_chunk_id: str | None = Field(
+        None, description="For child chunks, the chunk_id of their parent."
+    )
+    child_chunk_ids: list[str] | None = Field(
+        None, description="For parent chunks, the chunk_ids of their children."
+    )
 
 
 class Chunk(BaseModel):
@@ -74,12 +151,24 @@ class ProcessingMetrics(BaseModel):
     total_chunks_produced: int
 
 
+class ValidationSummary(BaseModel):
+    """Summary of the similarity scores computed for a document."""
+
+    level: ValidationLevel
+    scored_pairs: int
+    total_pairs: int
+    mean_similarity: float | None = None
+    min_similarity: float | None = None
+    max_similarity: float | None = None
+
+
 class DocumentProcessResponse(BaseModel):
     """Success response body for the /sync endpoint."""
 
     parent_document_id: str
     chunks: list[Chunk]
     metrics: ProcessingMetrics
+    validation_summary: ValidationSummary
 
 
 # --- Error Models ---
@@ -107,3 +196,8 @@ class BatchProcessResponse(BaseModel):
 
     results: list[DocumentProcessResponse]
     total_documents_processed: int
+    error: ErrorDetail | None = Field(
+        None,
+        description="Set if the batch failed after streaming started; `results` "
+        "then holds the documents finished before the failure.",
+    )
@@ -1,7 +1,14 @@
 # Pylance strict mode
+import random
 
 from unstructured.partition.text import partition_text
 
+_HASH_MASK = (1 << 64) - 1
+# Random per-character values for the Gear rolling hash, seeded so that
+# boundaries are identical across processes and releases.
+_gear_rng = random.Random(0x5EED)
+_GEAR = [_gear_rng.getrandbits(64) for _ in range(256)]
+
 
 def chunk_by_paragraph(text: str, min_chunk_size: int) -> list[str]:
     """Chunks text by paragraph, filtering for a minimum size."""
@@ -39,3 +46,79 @@ def chunk_by_fixed_size(text: str, chunk_size: int, chunk_overlap: int) -> list[
         i += step_size
 
     return chunks
+
+
+def chunk_hierarchically(
+    text: str, parent_chunk_size: int, chunk_size: int, chunk_overlap: int
+) -> list[tuple[str, list[str]]]:
+    """
+    Chunks text into non-overlapping parent chunks, each split into smaller
+    child chunks with overlap. Children never cross a parent boundary.
+    """
+    parents = chunk_by_fixed_size(text, parent_chunk_size, 0)
+    return [
+        (parent, chunk_by_fixed_size(parent, chunk_size, chunk_overlap))
+        for parent in parents
+    ]
+
+
+def _cut_mask(bits: int) -> int:
+    """A mask of the `bits` highest bits; those depend on the last ~64 chars."""
+    bits = max(bits, 1)
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+def chunk_by_content(
+    text: str, min_size: int, target_size: int, max_size: int
+) -> list[str]:
+    """
+    Chunks text at content-defined boundaries (FastCDC-style).
+
+    A Gear rolling hash over the preceding characters decides where chunks
+    end, so an edit only moves the boundaries next to it and the other chunks
+    come out identical. A stricter cut condition before `target_size` and a
+    looser one after it keep chunk sizes close to the target.
+    """
+    if not 0 < min_size <= target_size <= max_size:
+        raise ValueError("Sizes must satisfy 0 < min_size <= target_size <= max_size.")
+
+    if not text:
+        return []
+
+    bits = max(target_size.bit_length() - 1, 1)
+    mask_small = _cut_mask(bits + 1)
+    mask_large = _cut_mask(bits - 1)
+
+    chunks: list[str] = []
+    start = 0
+    length = len(text)
+    while start < length:
+        remaining = length - start
+        if remaining <= min_size:
+            chunks.append(text[start:])
+            break
+
+        end = min(start + max_size, length)
+        normal = min(start + target_size, end)
+        cut = end
+        h = 0
+        # Characters before min_size can never end a chunk, so skip them.
+        i = start + min_size
+        while i < normal:
+            h = ((h << 1) + _GEAR[ord(text[i]) & 0xFF]) & _HASH_MASK
+            if not h & mask_small:
+                cut = i + 1
+                break
+            i += 1
+        else:
+            while i < end:
+                h = ((h << 1) + _GEAR[ord(text[i]) & 0xFF]) & _HASH_MASK
+                if not h & mask_large:
+                    cut = i + 1
+                    break
+                i += 1
+
+        chunks.append(text[start:cut])
+        start = cut
+
+    return chunks
@@ -0,0 +1,106 @@
+# Pylance strict mode
+import os
+import threading
+import time
+
+from prometheus_client import Counter
+
+# Time budget of a request that does not send a timeout header.
+DEFAULT_TIMEOUT_SECONDS: float = float(
+    os.getenv("CORTEX_REQUEST_TIMEOUT_SECONDS", "60")
+)
+# Header carrying the client's remaining time budget in milliseconds.
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+# How often queued requests and disconnect watchers re-check their state.
+POLL_INTERVAL_SECONDS = 0.1
+
+CANCELLED_WORK = Counter(
+    "cortex_cancelled_work_total",
+    "Work abandoned because its deadline passed or its client went away.",
+    ["reason", "stage"],
+)
+
+
+class WorkAbandonedError(Exception):
+    """Raised when processing stops because nobody is waiting for the result."""
+
+    reason = "cancelled"
+
+    def __init__(self, stage: str, message: str) -> None:
+        super().__init__(message)
+        self.stage = stage
+
+
+class DeadlineExceededError(WorkAbandonedError):
+    """Raised when a request's deadline passes before processing finishes."""
+
+    reason = "deadline"
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(stage, f"Request deadline exceeded during '{stage}'.")
+
+
+class RequestCancelledError(WorkAbandonedError):
+    """Raised when a request is cancelled, e.g. because the client disconnected."""
+
+    reason = "cancelled"
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(stage, f"Request cancelled during '{stage}'.")
+
+
+class Deadline:
+    """
+    The point in time after which a request's result is no longer useful.
+
+    It is shared with the worker threads processing the request, which call
+    `check` between stages and encode batches so abandoned work stops early.
+    """
+
+    def __init__(self, timeout_seconds: float) -> None:
+        self.expires_at = time.monotonic() + timeout_seconds
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def from_timeout_ms(
+        cls, timeout_ms: float | None, default_seconds: float | None = None
+    ) -> "Deadline":
+        """
+        Starts a deadline from a client's timeout, or `default_seconds`
+        (`DEFAULT_TIMEOUT_SECONDS` if not given) when the client sent none.
+        """
+        if timeout_ms is None:
+            if default_seconds is None:
+                default_seconds = DEFAULT_TIMEOUT_SECONDS
+            return cls(default_seconds)
+        return cls(timeout_ms / 1000)
+
+    def remaining(self) -> float:
+        """Seconds left, negative once the deadline has passed."""
+        return self.expires_at - time.monotonic()
+
+    def cancel(self) -> None:
+        """Marks the request as abandoned, e.g. when the client disconnects."""
+        self._cancelled.set()
+
+    @property
+    def abandoned(self) -> bool:
+        return self._cancelled.is_set() or self.remaining() <= 0
+
+    def check(self, stage: str) -> None:
+        """
+        Stops work that can no longer succeed and counts it as cancelled.
+
+        Raises:
+            DeadlineExceededError: If the deadline has passed.
+            RequestCancelledError: If the request was cancelled.
+        """
+        error: WorkAbandonedError
+        if self.remaining() <= 0:
+            error = DeadlineExceededError(stage)
+        elif self._cancelled.is_set():
+            error = RequestCancelledError(stage)
+        else:
+            return
+        CANCELLED_WORK.labels(error.reason, stage).inc()
+        raise error
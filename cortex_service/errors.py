@@ -0,0 +1,39 @@
+# Pylance strict mode
+from fastapi import status
+
+from .api_models import ErrorDetail
+from .deadlines import DeadlineExceededError, WorkAbandonedError
+
+
+def abandoned_error(error: WorkAbandonedError) -> tuple[int, ErrorDetail]:
+    """Status code and body for work that was stopped before it finished."""
+    if isinstance(error, DeadlineExceededError):
+        return status.HTTP_504_GATEWAY_TIMEOUT, ErrorDetail(
+            error_code=5040,
+            message="The request deadline passed before processing finished.",
+            details={"stage": error.stage},
+        )
+    # Nobody reads this; 499 keeps cancelled requests apart in the access logs.
+    return 499, ErrorDetail(
+        error_code=4990,
+        message="The request was cancelled by the client.",
+        details={"stage": error.stage},
+    )
+
+
+def batch_error(error: Exception) -> tuple[int, ErrorDetail]:
+    """Status code and body for a failure while processing a batch."""
+    if isinstance(error, WorkAbandonedError):
+        return abandoned_error(error)
+    # Also covers pydantic's ValidationError and UnknownModelError.
+    if isinstance(error, ValueError):
+        return status.HTTP_422_UNPROCESSABLE_ENTITY, ErrorDetail(
+            error_code=4220,
+            message="The batch request body is invalid.",
+            details=str(error),
+        )
+    return status.HTTP_500_INTERNAL_SERVER_ERROR, ErrorDetail(
+        error_code=5000,
+        message="An internal error occurred during batch processing.",
+        details=str(error),
+    )
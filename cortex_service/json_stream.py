@@ -0,0 +1,198 @@
+# Pylance strict mode
+import codecs
+import json
+import re
+from typing import Any
+
+# Characters that change the nesting structure outside of a JSON string.
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+# Characters that matter while scanning the inside of a JSON string.
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class DocumentStreamParser:
+    """
+    Incrementally extracts the items of the top-level `documents` array from a
+    JSON body that arrives in arbitrary byte chunks.
+
+    Only the bytes of the document currently being received are buffered, so
+    memory use is bounded by the largest single document rather than the
+    whole batch. The rest of the body, with each document replaced by `{}`,
+    is kept and checked to be valid JSON on `close`; the separators between
+    documents are checked as they arrive.
+    """
+
+    def __init__(self, array_key: str = "documents") -> None:
+        self._array_key = array_key
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start: int | None = None
+        self._last_key: str | None = None
+        self._in_array = False
+        self._array_seen = False
+        self._item_start: int | None = None
+        self._opened = False
+        # Position in the documents array: "open" after `[`, "item" after a
+        # document and "comma" after a separator.
+        self._separator = "open"
+        # The body outside of the documents, which is validated on close.
+        self._skeleton: list[str] = []
+        self._outside_from = 0
+
+    def feed(self, data: bytes) -> list[dict[str, Any]]:
+        """Consumes a chunk of the body and returns every item completed by it."""
+        self._buffer += self._decoder.decode(data)
+        items = self._scan()
+        self._compact()
+        return items
+
+    def close(self) -> list[dict[str, Any]]:
+        """
+        Flushes the decoder and checks that the body was a complete object.
+
+        Raises:
+            ValueError: If the body is truncated, is not valid JSON or has no
+                documents array.
+        """
+        self._buffer += self._decoder.decode(b"", final=True)
+        items = self._scan()
+        if self._depth != 0 or self._in_string:
+            raise ValueError("Request body is not a complete JSON object.")
+        if not self._array_seen:
+            raise ValueError(f"Request body has no '{self._array_key}' array.")
+        self._skeleton.append(self._buffer[self._outside_from :])
+        try:
+            json.loads("".join(self._skeleton))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Request body is not valid JSON: {e}") from e
+        return items
+
+    def _scan(self) -> list[dict[str, Any]]:
+        items: list[dict[str, Any]] = []
+        buffer = self._buffer
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    return items
+                if match.group() == "\\":
+                    if match.end() >= len(buffer):
+                        # The escaped character has not arrived yet.
+                        self._pos = match.start()
+                        return items
+                    self._pos = match.end() + 1
+                    continue
+                self._in_string = False
+                if self._depth == 1 and self._string_start is not None:
+                    self._last_key = buffer[self._string_start : match.start()]
+                self._string_start = None
+                self._pos = match.end()
+                continue
+
+            match = _STRUCTURAL.search(buffer, self._pos)
+            gap = buffer[self._pos : match.start() if match else len(buffer)]
+            if self._depth == 0:
+                self._check_outside(gap, match.group() if match else None)
+            elif self._in_array and self._depth == 2:
+                self._check_separators(gap, match.group() if match else None)
+            if match is None:
+                self._pos = len(buffer)
+                return items
+            char = match.group()
+            self._pos = match.end()
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._string_start = match.end()
+            elif char in "{[":
+                self._depth += 1
+                if (
+                    char == "["
+                    and self._depth == 2
+                    and self._last_key == self._array_key
+                ):
+                    self._in_array = True
+                    self._array_seen = True
+                    self._separator = "open"
+                elif char == "{" and self._in_array and self._depth == 3:
+                    self._item_start = match.start()
+                    self._skeleton.append(buffer[self._outside_from : match.start()])
+                    self._skeleton.append("{}")
+                    self._outside_from = match.start()
+            else:
+                if self._depth == 0:
+                    raise ValueError("Unbalanced brackets in request body.")
+                if (
+                    char == "}"
+                    and self._in_array
+                    and self._depth == 3
+                    and self._item_start is not None
+                ):
+                    items.append(
+                        self._load_item(buffer[self._item_start : match.end()])
+                    )
+                    self._item_start = None
+                    self._outside_from = match.end()
+                    self._separator = "item"
+                elif char == "]" and self._in_array and self._depth == 2:
+                    self._in_array = False
+                self._depth -= 1
+
+    def _check_outside(self, gap: str, char: str | None) -> None:
+        """Allows only whitespace and a single object at the top level."""
+        if gap.strip() or (char is not None and (char != "{" or self._opened)):
+            raise ValueError("Unexpected data outside the top-level JSON object.")
+        if char == "{":
+            self._opened = True
+
+    def _check_separators(self, gap: str, char: str | None) -> None:
+        """Allows only whitespace and single commas between documents."""
+        for c in gap:
+            if c == ",":
+                if self._separator != "item":
+                    raise ValueError("Unexpected comma in documents array.")
+                self._separator = "comma"
+            elif not c.isspace():
+                raise ValueError("Every item of the documents array must be an object.")
+        if char == "{":
+            if self._separator == "item":
+                raise ValueError("Missing comma between documents.")
+            self._separator = "open"
+        elif char == "]":
+            if self._separator == "comma":
+                raise ValueError("Trailing comma in documents array.")
+        elif char is not None:
+            raise ValueError("Every item of the documents array must be an object.")
+
+    def _compact(self) -> None:
+        """Drops the already-consumed prefix of the buffer."""
+        if self._item_start is None:
+            self._skeleton.append(self._buffer[self._outside_from : self._pos])
+            self._outside_from = self._pos
+        keep_from = self._pos
+        if self._item_start is not None:
+            keep_from = self._item_start
+        elif self._string_start is not None:
+            keep_from = self._string_start
+        if keep_from == 0:
+            return
+        self._buffer = self._buffer[keep_from:]
+        self._pos -= keep_from
+        self._outside_from -= keep_from
+        if self._item_start is not None:
+            self._item_start -= keep_from
+        if self._string_start is not None:
+            self._string_start -= keep_from
+
+    @staticmethod
+    def _load_item(raw: str) -> dict[str, Any]:
+        try:
+            item: dict[str, Any] = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Malformed document in request body: {e}") from e
+        return item
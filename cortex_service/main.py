@@ -1,12 +1,15 @@
 # Pylance strict mode
+import asyncio
 import json
+import math
+from collections.abc import AsyncIterator
 from typing import Any
 
-from fastapi import Depends, FastAPI, status
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, Header, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 
-from . import services
+from . import admission, deadlines, errors, pipeline, services, tuning, validation
 from .api_models import (
     BatchProcessRequest,
     BatchProcessResponse,
@@ -15,9 +18,10 @@ from .api_models import (
     ErrorDetail,
 )
 from .loggin_config import configure_logging
-from .security import get_api_key
+from .security import ApiClient, get_api_key
 
 configure_logging()
+tuning.configure_from_env()
 
 
 # Custom JSON response class that pretty-prints by default
@@ -39,9 +43,52 @@ app = FastAPI(
     default_response_class=PrettyJSONResponse,
 )
 
+_BATCH_REQUEST_SCHEMA = BatchProcessRequest.model_json_schema(
+    ref_template="#/components/schemas/{model}"
+)
+_BATCH_REQUEST_SCHEMA.pop("$defs", None)
+
 # Add this line to expose the /metrics endpoint
 Instrumentator().instrument(app).expose(app)
 
+
+def throttled_response(error: admission.ThrottledError) -> JSONResponse:
+    """Builds the 429 response for a client that is over its work budget."""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+        content={
+            "error_code": 4290,
+            "message": "Work budget exhausted, retry later.",
+            "details": {"retry_after_seconds": round(error.retry_after, 3)},
+        },
+    )
+
+
+def abandoned_response(error: deadlines.WorkAbandonedError) -> JSONResponse:
+    """Builds the response for work that was stopped before it finished."""
+    status_code, detail = errors.abandoned_error(error)
+    return JSONResponse(status_code=status_code, content=detail.model_dump())
+
+
+async def watch_disconnect(
+    request: Request,
+    deadline: deadlines.Deadline,
+    body_read: asyncio.Event | None = None,
+) -> None:
+    """
+    Cancels the deadline once the client disconnects.
+
+    Polling for a disconnect consumes request messages, so when the body is
+    streamed, the watch only starts after `body_read` is set.
+    """
+    if body_read is not None:
+        await body_read.wait()
+    while not await request.is_disconnected():
+        await asyncio.sleep(deadlines.POLL_INTERVAL_SECONDS)
+    deadline.cancel()
+
+
 # --- Endpoints ---
 
 
@@ -58,20 +105,54 @@ async def health_check() -> dict[str, str]:
     responses={
         401: {"model": ErrorDetail},
         422: {"model": ErrorDetail},
+        429: {"model": ErrorDetail},
         500: {"model": ErrorDetail},
+        504: {"model": ErrorDetail},
     },
 )
 async def process_document(
     request: DocumentProcessRequest,
-    api_key: str = Depends(get_api_key),
+    raw_request: Request,
+    client: ApiClient = Depends(get_api_key),
+    timeout_ms: float | None = Header(
+        default=None, alias=deadlines.TIMEOUT_HEADER, gt=0
+    ),
 ) -> DocumentProcessResponse | JSONResponse:
     """
     Processes a single unstructured document, chunks it intelligently,
     and returns AI-ready, semantically coherent chunks.
+
+    Processing stops early once the request's deadline passes or the client
+    disconnects.
     """
+    deadline = deadlines.Deadline.from_timeout_ms(timeout_ms)
+    try:
+        validation.REGISTRY.check(request.embedding_model or validation.DEFAULT_MODEL)
+    except validation.UnknownModelError as e:
+        return JSONResponse(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            content={
+                "error_code": 4220,
+                "message": "The request is invalid.",
+                "details": str(e),
+            },
+        )
+
+    cost = admission.estimate_work(request)
+    try:
+        admission.reserve(client, cost)
+    except admission.ThrottledError as e:
+        return throttled_response(e)
+
+    watcher = asyncio.create_task(watch_disconnect(raw_request, deadline))
     try:
-        response = services.process_document_logic(request)
+        async with admission.SCHEDULER.slot(client, cost, deadline):
+            response = await asyncio.to_thread(
+                services.process_document_logic, request, deadline
+            )
         return response
+    except deadlines.WorkAbandonedError as e:
+        return abandoned_response(e)
     except Exception as e:
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -81,33 +162,86 @@ async def process_document(
                 "details": str(e),
             },
         )
+    finally:
+        watcher.cancel()
 
 
 @app.post(
     "/api/v1/sync-batch",
     response_model=BatchProcessResponse,
     tags=["Processing"],
+    # The body is read as a stream, so its schema is documented explicitly.
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": _BATCH_REQUEST_SCHEMA}},
+            "required": True,
+        }
+    },
     responses={
         401: {"model": ErrorDetail},
         422: {"model": ErrorDetail},
+        429: {"model": ErrorDetail},
         500: {"model": ErrorDetail},
+        504: {"model": ErrorDetail},
     },
 )
 async def process_document_batch(
-    request: BatchProcessRequest, api_key: str = Depends(get_api_key)
-) -> BatchProcessResponse | JSONResponse:
+    request: Request,
+    client: ApiClient = Depends(get_api_key),
+    timeout_ms: float | None = Header(
+        default=None, alias=deadlines.TIMEOUT_HEADER, gt=0
+    ),
+) -> StreamingResponse | JSONResponse:
     """
     Processes a batch of unstructured documents in a single request.
+
+    The body is parsed incrementally and documents flow through overlapping
+    parsing, chunking, encoding and serialization stages, so the response
+    starts streaming before the whole batch has been read. Each document is
+    charged to the client's work budget as it is parsed, and its chunking and
+    its encoding each hold a fairly scheduled slot, as /sync does.
+    A deadline sent by the client covers the whole batch; once it passes or
+    the client disconnects, documents still in the pipeline are abandoned.
     """
     try:
-        response = services.process_documents_batch_logic(request)
-        return response
+        # The size of a streamed batch is unknown up front, so only require
+        # budget to be left here. Each document is charged as it arrives,
+        # after waiting for the budget to recover if it has run out.
+        admission.reserve(client, 0)
+    except admission.ThrottledError as e:
+        return throttled_response(e)
+
+    # A bulk backfill may rightly run for a long time, so only a deadline the
+    # client asked for applies; a disconnect still cancels the batch.
+    deadline = deadlines.Deadline.from_timeout_ms(timeout_ms, math.inf)
+    body_read = asyncio.Event()
+
+    async def request_body() -> AsyncIterator[bytes]:
+        async for data in request.stream():
+            yield data
+        body_read.set()
+
+    stream = pipeline.stream_batch_response(
+        request_body(),
+        admit=lambda doc: admission.charge(client, doc, deadline),
+        gate=lambda doc, stage: admission.stage_slot(client, doc, stage, deadline),
+        deadline=deadline,
+    )
+    watcher = asyncio.create_task(watch_disconnect(request, deadline, body_read))
+    try:
+        first = await anext(stream)
     except Exception as e:
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={
-                "error_code": 5000,
-                "message": "An internal error occurred during batch processing.",
-                "details": str(e),
-            },
-        )
+        watcher.cancel()
+        status_code, detail = errors.batch_error(e)
+        return JSONResponse(status_code=status_code, content=detail.model_dump())
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield first
+            async for part in stream:
+                yield part
+        finally:
+            watcher.cancel()
+            await stream.aclose()
+
+    return StreamingResponse(body(), media_type="application/json")
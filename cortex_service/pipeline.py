@@ -0,0 +1,209 @@
+# Pylance strict mode
+import asyncio
+import os
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from contextlib import AbstractAsyncContextManager, nullcontext
+from dataclasses import dataclass, field
+
+from . import errors, services
+from .api_models import DocumentProcessRequest
+from .deadlines import Deadline
+from .json_stream import DocumentStreamParser
+
+# Hard ceiling on documents that have been parsed but not yet written out.
+BATCH_MAX_IN_FLIGHT: int = int(os.getenv("CORTEX_BATCH_MAX_IN_FLIGHT", "8"))
+# Capacity of the hand-off queue between two adjacent stages.
+BATCH_STAGE_QUEUE_SIZE: int = int(os.getenv("CORTEX_BATCH_STAGE_QUEUE_SIZE", "2"))
+
+
+@dataclass
+class _InFlightDocument:
+    """A document moving through the batch pipeline."""
+
+    request: DocumentProcessRequest
+    deadline: Deadline | None = None
+    start_time: float = 0.0
+    chunked: services.ChunkedDocument = field(
+        default_factory=lambda: services.ChunkedDocument([], [], [])
+    )
+    similarities: list[float | None] = field(default_factory=list)
+
+
+class _EndOfStream:
+    """Marks that the upstream stage has no more documents."""
+
+
+@dataclass
+class _StageFailure:
+    """Carries an upstream exception down to the response writer."""
+
+    error: Exception
+
+
+_END = _EndOfStream()
+_StageItem = _InFlightDocument | _EndOfStream | _StageFailure
+# Called once for every document as soon as it is parsed, e.g. to charge it.
+DocumentAdmission = Callable[[DocumentProcessRequest], Awaitable[None]]
+# Wraps one CPU-bound stage ("chunk" or "encode") of a document, e.g. to hold
+# a scheduling slot while it runs.
+StageGate = Callable[[DocumentProcessRequest, str], AbstractAsyncContextManager[None]]
+
+
+def _chunk_stage(doc: _InFlightDocument) -> _InFlightDocument:
+    if doc.deadline is not None:
+        doc.deadline.check("chunk")
+    doc.start_time = time.monotonic()
+    doc.chunked = services.chunk_document(doc.request)
+    return doc
+
+
+def _encode_stage(doc: _InFlightDocument) -> _InFlightDocument:
+    if doc.deadline is not None:
+        doc.deadline.check("encode")
+    doc.similarities = services.score_chunks(doc.request, doc.chunked, doc.deadline)
+    return doc
+
+
+def _serialize(doc: _InFlightDocument) -> bytes:
+    if doc.deadline is not None:
+        doc.deadline.check("serialize")
+    response = services.build_document_response(
+        doc.request, doc.chunked, doc.similarities, doc.start_time
+    )
+    return response.model_dump_json().encode("utf-8")
+
+
+async def _parse_stage(
+    body: AsyncIterator[bytes],
+    outbox: asyncio.Queue[_StageItem],
+    slots: asyncio.Semaphore,
+    admit: DocumentAdmission | None = None,
+    deadline: Deadline | None = None,
+) -> None:
+    """Parses documents from the body stream as soon as each one is complete."""
+    parser = DocumentStreamParser()
+
+    async def emit(raw: object) -> None:
+        await slots.acquire()
+        if deadline is not None:
+            deadline.check("parse")
+        request = DocumentProcessRequest.model_validate(raw)
+        if admit is not None:
+            await admit(request)
+        await outbox.put(_InFlightDocument(request, deadline))
+
+    try:
+        async for data in body:
+            for raw in parser.feed(data):
+                await emit(raw)
+        for raw in parser.close():
+            await emit(raw)
+    except Exception as e:
+        await outbox.put(_StageFailure(e))
+        return
+    await outbox.put(_END)
+
+
+async def _worker_stage(
+    stage: str,
+    work: Callable[[_InFlightDocument], _InFlightDocument],
+    inbox: asyncio.Queue[_StageItem],
+    outbox: asyncio.Queue[_StageItem],
+    gate: StageGate | None = None,
+) -> None:
+    """Runs one CPU-bound stage in a worker thread, one document at a time."""
+    while True:
+        item = await inbox.get()
+        if not isinstance(item, _InFlightDocument):
+            await outbox.put(item)
+            return
+        try:
+            async with gate(item.request, stage) if gate else nullcontext():
+                result = await asyncio.to_thread(work, item)
+        except Exception as e:
+            await outbox.put(_StageFailure(e))
+            return
+        await outbox.put(result)
+
+
+async def stream_batch_response(
+    body: AsyncIterator[bytes],
+    max_in_flight: int = BATCH_MAX_IN_FLIGHT,
+    admit: DocumentAdmission | None = None,
+    gate: StageGate | None = None,
+    deadline: Deadline | None = None,
+) -> AsyncGenerator[bytes]:
+    """
+    Processes a `BatchProcessRequest` body incrementally and yields the
+    serialized `BatchProcessResponse` piece by piece.
+
+    Parsing, chunking, encoding and serialization run as concurrent stages
+    connected by bounded queues, so chunking of the next document overlaps
+    with encoding of the current one, and at most `max_in_flight` documents
+    are held in memory at once. Results keep the order of the request.
+    If `admit` is given, it is awaited for every document once it is parsed.
+    If `gate` is given, the chunking and the encoding of every document each
+    run inside it.
+    If `deadline` is given, every stage checks it, and it is cancelled when
+    the response is closed early so that work still running stops.
+    The first chunk is only yielded once the first document has been fully
+    processed, so early failures can still be reported with a status code.
+    A later failure ends the response with an `error` member, so the body
+    stays valid JSON.
+
+    Raises, only before the first document has been yielded:
+        ValueError: If the body is malformed.
+        pydantic.ValidationError: If a document does not match the schema.
+        WorkAbandonedError: If the deadline passes or the request is cancelled.
+    """
+    slots = asyncio.Semaphore(max_in_flight)
+    parsed: asyncio.Queue[_StageItem] = asyncio.Queue(BATCH_STAGE_QUEUE_SIZE)
+    chunked: asyncio.Queue[_StageItem] = asyncio.Queue(BATCH_STAGE_QUEUE_SIZE)
+    encoded: asyncio.Queue[_StageItem] = asyncio.Queue(BATCH_STAGE_QUEUE_SIZE)
+    tasks = [
+        asyncio.create_task(_parse_stage(body, parsed, slots, admit, deadline)),
+        asyncio.create_task(
+            _worker_stage("chunk", _chunk_stage, parsed, chunked, gate)
+        ),
+        asyncio.create_task(
+            _worker_stage("encode", _encode_stage, chunked, encoded, gate)
+        ),
+    ]
+
+    prefix = b'{"results":['
+    processed = 0
+    finished = False
+    error: Exception | None = None
+    try:
+        while True:
+            item = await encoded.get()
+            if isinstance(item, _EndOfStream):
+                break
+            try:
+                if isinstance(item, _StageFailure):
+                    raise item.error
+                payload = await asyncio.to_thread(_serialize, item)
+            except Exception as e:
+                if processed == 0:
+                    raise
+                error = e
+                break
+            slots.release()
+            yield (prefix if processed == 0 else b",") + payload
+            processed += 1
+
+        if processed == 0:
+            yield prefix
+        tail = f'],"total_documents_processed":{processed}'
+        if error is not None:
+            tail += ',"error":' + errors.batch_error(error)[1].model_dump_json()
+        else:
+            finished = True
+        yield (tail + "}").encode()
+    finally:
+        for task in tasks:
+            task.cancel()
+        if deadline is not None and not finished:
+            # Cancelling the tasks does not stop their worker threads.
+            deadline.cancel()
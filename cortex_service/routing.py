@@ -0,0 +1,287 @@
+# Pylance strict mode
+import bisect
+import hashlib
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import requests
+
+# Routing runs in clients, so it only depends on `requests`. Must match
+# `deadlines.TIMEOUT_HEADER`.
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+# Responses that mean the node, not the document, is the problem.
+_UNAVAILABLE_STATUS_CODES = frozenset({502, 503, 504})
+# Error code of a 504 from the service itself: the request ran out of its own
+# deadline, which another node would not change.
+_DEADLINE_EXCEEDED_ERROR_CODE = 5040
+
+
+def _is_unavailable(response: requests.Response) -> bool:
+    """Whether a response means the node could not serve the request."""
+    if response.status_code not in _UNAVAILABLE_STATUS_CODES:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return True
+    return not (
+        isinstance(body, dict)
+        and body.get("error_code") == _DEADLINE_EXCEEDED_ERROR_CODE
+    )
+
+
+def _hash(value: str) -> int:
+    """Stable 64-bit hash; Python's built-in hash() differs between processes."""
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes.
+
+    Each node is placed on the ring `virtual_nodes` times, so keys spread
+    evenly and adding or removing a node only moves about 1/N of the keys.
+    """
+
+    def __init__(
+        self, nodes: list[str] | None = None, virtual_nodes: int = 100
+    ) -> None:
+        self.virtual_nodes = virtual_nodes
+        self._points: list[int] = []
+        self._owners: dict[int, str] = {}
+        self._nodes: set[str] = set()
+        for node in nodes or []:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> list[str]:
+        return sorted(self._nodes)
+
+    def add_node(self, node: str) -> None:
+        """Places a node on the ring."""
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self.virtual_nodes):
+            point = _hash(f"{node}#{replica}")
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove_node(self, node: str) -> None:
+        """Takes a node off the ring; its keys move to the next nodes."""
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        for replica in range(self.virtual_nodes):
+            point = _hash(f"{node}#{replica}")
+            del self._owners[point]
+            self._points.pop(bisect.bisect_left(self._points, point))
+
+    def node_for(self, key: str) -> str:
+        """
+        Returns the node that owns a key.
+
+        Raises:
+            LookupError: If the ring is empty.
+        """
+        return next(self.nodes_for(key))
+
+    def nodes_for(self, key: str) -> Iterator[str]:
+        """
+        Yields every node once, starting with the owner of the key and then in
+        ring order, which is the failover order for that key.
+
+        Raises:
+            LookupError: If the ring is empty.
+        """
+        if not self._points:
+            raise LookupError("The hash ring has no nodes.")
+        start = bisect.bisect(self._points, _hash(key))
+        seen: set[str] = set()
+        for offset in range(len(self._points)):
+            node = self._owners[self._points[(start + offset) % len(self._points)]]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self._nodes):
+                    return
+
+
+class CortexRouter:
+    """
+    Sends each document to the Cortex node that owns its `document_id`, so
+    repeated syncs of a document reach the same warm per-node state.
+
+    A node that refuses or times out the connection, or is unavailable (502,
+    503 or 504), is skipped for `cooldown_seconds`, and its documents fail over to the
+    next node on the ring. When every node is marked unhealthy, all of them
+    are tried. A 504 that reports the request's own deadline (error code
+    5040) is returned as is.
+
+    Each `/sync` attempt tells the node its `timeout`, so a node stops working
+    on a request once the router has stopped waiting for it.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[str],
+        api_key: str,
+        virtual_nodes: int = 100,
+        cooldown_seconds: float = 30.0,
+        timeout: float = 30.0,
+        session: requests.Session | None = None,
+    ) -> None:
+        self.ring = HashRing([e.rstrip("/") for e in endpoints], virtual_nodes)
+        self.api_key = api_key
+        self.cooldown_seconds = cooldown_seconds
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self._unhealthy_until: dict[str, float] = {}
+
+    def add_endpoint(self, endpoint: str) -> None:
+        """Adds a node that joined; only the keys it now owns move to it."""
+        self.ring.add_node(endpoint.rstrip("/"))
+
+    def remove_endpoint(self, endpoint: str) -> None:
+        """Removes a node that left; its keys move to their next nodes."""
+        endpoint = endpoint.rstrip("/")
+        self.ring.remove_node(endpoint)
+        self._unhealthy_until.pop(endpoint, None)
+
+    def is_healthy(self, endpoint: str) -> bool:
+        return self._unhealthy_until.get(endpoint, 0.0) <= time.monotonic()
+
+    def mark_unhealthy(self, endpoint: str) -> None:
+        self._unhealthy_until[endpoint] = time.monotonic() + self.cooldown_seconds
+
+    def check_health(self) -> dict[str, bool]:
+        """Probes `/health` on every node and updates their status."""
+        status: dict[str, bool] = {}
+        for endpoint in self.ring.nodes:
+            try:
+                response = self.session.get(f"{endpoint}/health", timeout=self.timeout)
+                healthy = response.status_code == 200
+            except requests.exceptions.RequestException:
+                healthy = False
+            if healthy:
+                self._unhealthy_until.pop(endpoint, None)
+            else:
+                self.mark_unhealthy(endpoint)
+            status[endpoint] = healthy
+        return status
+
+    def endpoints_for(self, document_id: str) -> list[str]:
+        """Returns the nodes to try for a document, healthy ones first."""
+        ordered = list(self.ring.nodes_for(document_id))
+        healthy = [e for e in ordered if self.is_healthy(e)]
+        return healthy + [e for e in ordered if e not in healthy]
+
+    def post(
+        self, path: str, document_id: str, payload: dict[str, Any]
+    ) -> requests.Response:
+        """
+        Posts a payload to the node that owns `document_id`, failing over
+        along the ring.
+
+        Raises:
+            requests.exceptions.ReadTimeout: If a node did not answer in time.
+            requests.exceptions.RequestException: If every node failed.
+        """
+        return self._post(path, self.endpoints_for(document_id), payload)
+
+    def _post(
+        self,
+        path: str,
+        endpoints: list[str],
+        payload: dict[str, Any],
+        send_timeout: bool = True,
+    ) -> requests.Response:
+        headers = {"Content-Type": "application/json", "X-API-Key": self.api_key}
+        if send_timeout:
+            headers[TIMEOUT_HEADER] = str(int(self.timeout * 1000))
+        last_error: requests.exceptions.RequestException | None = None
+        for endpoint in endpoints:
+            try:
+                response = self.session.post(
+                    f"{endpoint}{path}",
+                    headers=headers,
+                    json=payload,
+                    timeout=self.timeout,
+                )
+            except requests.exceptions.ConnectionError as e:
+                # Also covers ConnectTimeout. A read timeout means the node is
+                # slow, not down, and re-posting the document elsewhere would
+                # only add load, so it is raised to the caller.
+                self.mark_unhealthy(endpoint)
+                last_error = e
+                continue
+            if _is_unavailable(response):
+                self.mark_unhealthy(endpoint)
+                last_error = requests.exceptions.HTTPError(
+                    f"{response.status_code} from {endpoint}", response=response
+                )
+                continue
+            return response
+        assert last_error is not None
+        raise last_error
+
+    def sync_document(self, payload: dict[str, Any]) -> requests.Response:
+        """Sends a `/api/v1/sync` request to the document's node."""
+        return self.post("/api/v1/sync", str(payload["document_id"]), payload)
+
+    def sync_batch(self, documents: list[dict[str, Any]]) -> dict[str, Any]:
+        """
+        Splits documents by node, sends each node one `/api/v1/sync-batch`
+        request in parallel, and merges the responses into one batch response.
+
+        Each group fails over as a whole, along the ring order of its first
+        document. Results keep the order of `documents`. If a node stopped
+        partway through its batch, the results it finished are kept and the
+        first node error is returned under `error`. No deadline is sent, since
+        a batch may rightly run longer than `timeout`; `timeout` still bounds
+        each wait for the next part of a node's response.
+
+        Raises:
+            requests.exceptions.HTTPError: If a node rejected its batch.
+            requests.exceptions.ReadTimeout: If a node did not answer in time.
+            requests.exceptions.RequestException: If every node failed for a
+                group.
+        """
+        groups: dict[str, list[int]] = {}
+        for index, document in enumerate(documents):
+            node = self.endpoints_for(str(document["document_id"]))[0]
+            groups.setdefault(node, []).append(index)
+
+        def send(indices: list[int]) -> dict[str, Any]:
+            first_id = str(documents[indices[0]]["document_id"])
+            response = self._post(
+                "/api/v1/sync-batch",
+                self.endpoints_for(first_id),
+                {"documents": [documents[i] for i in indices]},
+                send_timeout=False,
+            )
+            response.raise_for_status()
+            body: dict[str, Any] = response.json()
+            return body
+
+        ordered: list[tuple[int, Any]] = []
+        error: Any = None
+        with ThreadPoolExecutor(max_workers=max(len(groups), 1)) as pool:
+            bodies = pool.map(send, groups.values())
+            for indices, body in zip(groups.values(), bodies, strict=True):
+                # A batch that stopped early returns fewer results.
+                ordered.extend(zip(indices, body["results"], strict=False))
+                if error is None:
+                    error = body.get("error")
+        ordered.sort(key=lambda item: item[0])
+
+        merged: dict[str, Any] = {
+            "results": [result for _, result in ordered],
+            "total_documents_processed": len(ordered),
+        }
+        if error is not None:
+            merged["error"] = error
+        return merged
@@ -1,9 +1,11 @@
 # Pylance strict mode
+import json
 import os
 
 from dotenv import load_dotenv
 from fastapi import HTTPException, Security, status
 from fastapi.security import APIKeyHeader
+from pydantic import BaseModel, Field, TypeAdapter
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,8 +15,48 @@ API_KEY_HEADER = APIKeyHeader(name="X-API-Key", auto_error=False)
 # For testing purposes, provide a default key if none is set
 CORTEX_API_KEY: str | None = os.getenv("CORTEX_API_KEY", "test-key-if-not-set")
 
+# Default work budget, measured in estimated work units (~1 per character).
+DEFAULT_WORK_RATE: float = float(os.getenv("CORTEX_DEFAULT_WORK_RATE", "200000"))
+DEFAULT_WORK_BURST: float = float(os.getenv("CORTEX_DEFAULT_WORK_BURST", "5000000"))
 
-def get_api_key(api_key_header: str | None = Security(API_KEY_HEADER)) -> str:
+
+class ApiClient(BaseModel):
+    """A tenant identified by an API key, with its scheduling budget."""
+
+    name: str = Field(..., description="Label used in logs and metrics.")
+    key: str = Field(..., description="Secret sent in the X-API-Key header.")
+    weight: float = Field(
+        1.0, gt=0, description="Share of processing capacity under contention."
+    )
+    rate: float = Field(
+        DEFAULT_WORK_RATE, gt=0, description="Work units refilled per second."
+    )
+    burst: float = Field(
+        DEFAULT_WORK_BURST, gt=0, description="Maximum work units saved up."
+    )
+
+
+def load_api_clients() -> dict[str, ApiClient]:
+    """
+    Loads the configured clients, keyed by their API key.
+
+    `CORTEX_API_KEYS` holds a JSON list of client objects. When it is not set,
+    the single `CORTEX_API_KEY` is used as a client named "default".
+    """
+    raw = os.getenv("CORTEX_API_KEYS")
+    if raw:
+        clients = TypeAdapter(list[ApiClient]).validate_python(json.loads(raw))
+    elif CORTEX_API_KEY:
+        clients = [ApiClient.model_validate({"name": "default", "key": CORTEX_API_KEY})]
+    else:
+        clients = []
+    return {client.key: client for client in clients}
+
+
+API_CLIENTS: dict[str, ApiClient] = load_api_clients()
+
+
+def get_api_key(api_key_header: str | None = Security(API_KEY_HEADER)) -> ApiClient:
     """
     Retrieves and validates the API key from the request headers.
 
@@ -25,8 +67,9 @@ def get_api_key(api_key_header: str | None = Security(API_KEY_HEADER)) -> str:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="API Key is missing."
         )
-    if api_key_header != CORTEX_API_KEY:
+    client = API_CLIENTS.get(api_key_header)
+    if client is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API Key."
         )
-    return api_key_header
+    return client
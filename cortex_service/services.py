@@ -1,55 +1,181 @@
 # Pylance strict mode
+import hashlib
 import time
 import uuid
+from typing import NamedTuple
+
+import numpy as np
+from numpy.typing import NDArray
 
 from . import chunking, validation
 from .api_models import (
-    BatchProcessRequest,
-    BatchProcessResponse,
     Chunk,
+    ChunkLevel,
     ChunkMetadata,
     ChunkValidation,
     DocumentProcessRequest,
     DocumentProcessResponse,
     ProcessingMetrics,
 )
+from .deadlines import Deadline
 
 
-def process_document_logic(request: DocumentProcessRequest) -> DocumentProcessResponse:
-    """
-    Orchestrates the document processing workflow.
-    Selects chunking strategy, performs chunking, validates, and formats the response.
-    """
-    start_time = time.monotonic()
+class ChunkedDocument(NamedTuple):
+    """Chunk texts in response order, with the hierarchy links between them."""
 
-    # 1. Select and execute chunking strategy
+    texts: list[str]
+    # "parent"/"child" for hierarchical chunking, None for flat strategies
+    levels: list[ChunkLevel | None]
+    # For child chunks, the position of their parent in `texts`
+    parents: list[int | None]
+
+
+def chunk_document(request: DocumentProcessRequest) -> ChunkedDocument:
+    """Selects and executes the chunking strategy requested for a document."""
     strategy = request.chunking_strategy
     if strategy.name == "paragraph":
-        chunks_text = chunking.chunk_by_paragraph(
+        texts = chunking.chunk_by_paragraph(
             request.content, strategy.params.min_chunk_size
         )
     elif strategy.name == "fixed_size":
-        chunks_text = chunking.chunk_by_fixed_size(
+        texts = chunking.chunk_by_fixed_size(
             request.content, strategy.params.chunk_size, strategy.params.chunk_overlap
         )
+    elif strategy.name == "content_defined":
+        texts = chunking.chunk_by_content(
+            request.content,
+            strategy.params.min_chunk_size,
+            strategy.params.target_chunk_size,
+            strategy.params.max_chunk_size,
+        )
+    elif strategy.name == "hierarchical":
+        return _flatten_hierarchy(
+            chunking.chunk_hierarchically(
+                request.content,
+                strategy.params.parent_chunk_size,
+                strategy.params.chunk_size,
+                strategy.params.chunk_overlap,
+            )
+        )
     else:
         # This case should ideally be caught by Pydantic, but defensive coding is good.
         raise ValueError(f"Unknown chunking strategy: {strategy.name}")
+    return ChunkedDocument(texts, [None] * len(texts), [None] * len(texts))
 
-    # 2. Perform semantic validation
-    similarities = validation.calculate_semantic_similarity(chunks_text)
 
-    # 3. Format the response chunks
+def _flatten_hierarchy(tree: list[tuple[str, list[str]]]) -> ChunkedDocument:
+    """Lays out each parent chunk followed by its children."""
+    texts: list[str] = []
+    levels: list[ChunkLevel | None] = []
+    parents: list[int | None] = []
+    for parent_text, children in tree:
+        parent_position = len(texts)
+        texts.append(parent_text)
+        levels.append("parent")
+        parents.append(None)
+        for child_text in children:
+            texts.append(child_text)
+            levels.append("child")
+            parents.append(parent_position)
+    return ChunkedDocument(texts, levels, parents)
+
+
+def score_chunks(
+    request: DocumentProcessRequest,
+    chunked: ChunkedDocument,
+    deadline: Deadline | None = None,
+) -> list[float | None]:
+    """
+    Runs semantic validation at the level requested for a document.
+
+    Each chunk is compared with the next chunk of the same level. Only leaf
+    chunks are encoded; a parent's embedding is the mean of its children's,
+    so hierarchical chunking costs a single encode pass.
+    """
+    leaves = [i for i, level in enumerate(chunked.levels) if level != "parent"]
+    leaf_texts = [chunked.texts[i] for i in leaves]
+    pairs = validation.select_pairs(
+        max(len(leaf_texts) - 1, 0), request.validation, request.document_id
+    )
+    if len(leaves) == len(chunked.texts):
+        return validation.calculate_semantic_similarity(
+            leaf_texts, request.embedding_model, pairs, deadline
+        )
+
+    leaf_embeddings = validation.embed_chunks(
+        leaf_texts,
+        validation.needed_chunks(len(leaf_texts), pairs),
+        request.embedding_model,
+        deadline,
+    )
+    leaf_scores = validation.adjacent_similarities(leaf_embeddings, len(leaf_texts))
+    if pairs is not None:
+        requested = set(pairs)
+        leaf_scores = [s if i in requested else None for i, s in enumerate(leaf_scores)]
+
+    # Pool child embeddings into parent embeddings. A parent is only pooled
+    # when all of its children were encoded; a partial mean, as sampled
+    # validation would give, does not represent the parent.
+    parent_positions = [
+        i for i, level in enumerate(chunked.levels) if level == "parent"
+    ]
+    children: dict[int, list[NDArray[np.float64]]] = {i: [] for i in parent_positions}
+    complete = dict.fromkeys(parent_positions, True)
+    for leaf_index, position in enumerate(leaves):
+        parent = chunked.parents[position]
+        if parent is None:
+            continue
+        if leaf_index in leaf_embeddings:
+            children[parent].append(leaf_embeddings[leaf_index])
+        else:
+            complete[parent] = False
+    parent_embeddings = {
+        k: validation.pool_embeddings(children[position])
+        for k, position in enumerate(parent_positions)
+        if children[position] and complete[position]
+    }
+    parent_scores = validation.adjacent_similarities(
+        parent_embeddings, len(parent_positions)
+    )
+
+    similarities: list[float | None] = [None] * len(chunked.texts)
+    for leaf_index, position in enumerate(leaves):
+        similarities[position] = leaf_scores[leaf_index]
+    for k, position in enumerate(parent_positions):
+        similarities[position] = parent_scores[k]
+    return similarities
+
+
+def build_document_response(
+    request: DocumentProcessRequest,
+    chunked: ChunkedDocument,
+    similarities: list[float | None],
+    start_time: float,
+) -> DocumentProcessResponse:
+    """Formats chunked and validated text into the response model."""
+    chunk_ids = [str(uuid.uuid4()) for _ in chunked.texts]
+    child_ids: dict[int, list[str]] = {
+        i: [] for i, level in enumerate(chunked.levels) if level == "parent"
+    }
+    for i, parent in enumerate(chunked.parents):
+        if parent is not None:
+            child_ids[parent].append(chunk_ids[i])
+
     response_chunks: list[Chunk] = []
-    for i, text in enumerate(chunks_text):
+    for i, text in enumerate(chunked.texts):
+        parent = chunked.parents[i]
         chunk = Chunk(
-            chunk_id=str(uuid.uuid4()),
+            chunk_id=chunk_ids[i],
             chunk_index=i,
             text=text,
             metadata=ChunkMetadata(
                 parent_document_id=request.document_id,
                 original_metadata=request.metadata,
                 validation=ChunkValidation(similarity_with_next_chunk=similarities[i]),
+                content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                chunk_level=chunked.levels[i],
+                parent_chunk_id=chunk_ids[parent] if parent is not None else None,
+                child_chunk_ids=child_ids.get(i),
             ),
         )
         response_chunks.append(chunk)
@@ -57,6 +183,12 @@ def process_document_logic(request: DocumentProcessRequest) -> DocumentProcessRe
     end_time = time.monotonic()
     processing_time_ms = int((end_time - start_time) * 1000)
 
+    # Summary statistics describe the leaf chunks, which carry the text.
+    leaf_scores = [
+        s
+        for s, level in zip(similarities, chunked.levels, strict=True)
+        if level != "parent"
+    ]
     return DocumentProcessResponse(
         parent_document_id=request.document_id,
         chunks=response_chunks,
@@ -64,16 +196,35 @@ def process_document_logic(request: DocumentProcessRequest) -> DocumentProcessRe
             processing_time_ms=processing_time_ms,
             total_chunks_produced=len(response_chunks),
         ),
+        validation_summary=validation.summarize(leaf_scores, request.validation.level),
     )
 
 
-def process_documents_batch_logic(request: BatchProcessRequest) -> BatchProcessResponse:
-    """Orchestrates the batch processing of multiple documents."""
-    results: list[DocumentProcessResponse] = []
-    for doc in request.documents:
-        # For the MVP, we process sequentially.
-        # A future optimization could use asyncio for concurrent processing.
-        result = process_document_logic(doc)
-        results.append(result)
+def process_document_logic(
+    request: DocumentProcessRequest, deadline: Deadline | None = None
+) -> DocumentProcessResponse:
+    """
+    Orchestrates the document processing workflow.
+    Selects chunking strategy, performs chunking, validates, and formats the response.
+
+    If a `deadline` is given, it is checked between stages and encode batches.
+
+    Raises:
+        WorkAbandonedError: If the deadline passes or the request is cancelled.
+    """
+    start_time = time.monotonic()
+
+    # 1. Select and execute chunking strategy
+    if deadline is not None:
+        deadline.check("chunk")
+    chunked = chunk_document(request)
+
+    # 2. Perform semantic validation
+    if deadline is not None:
+        deadline.check("encode")
+    similarities = score_chunks(request, chunked, deadline)
 
-    return BatchProcessResponse(results=results, total_documents_processed=len(results))
+    # 3. Format the response chunks
+    if deadline is not None:
+        deadline.check("serialize")
+    return build_document_response(request, chunked, similarities, start_time)
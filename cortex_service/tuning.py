@@ -0,0 +1,253 @@
+# Pylance strict mode
+import argparse
+import logging
+import math
+import os
+import random
+import time
+from datetime import UTC, datetime
+
+import torch
+from prometheus_client import Gauge, Info
+from pydantic import BaseModel, Field
+
+from . import validation
+
+logger = logging.getLogger(__name__)
+
+# off: library defaults; load: apply a saved profile if one exists and fits;
+# calibrate: load, or benchmark when no fitting profile exists;
+# force: always benchmark.
+AUTOTUNE_MODE: str = os.getenv("CORTEX_AUTOTUNE", "off").lower()
+PROFILE_PATH: str = os.getenv(
+    "CORTEX_TUNING_PROFILE",
+    os.path.join(
+        os.getenv("HF_HOME", os.path.expanduser("~/.cache")),
+        "cortex_tuning_profile.json",
+    ),
+)
+LATENCY_BOUND_MS: float = float(os.getenv("CORTEX_TUNING_LATENCY_BOUND_MS", "500"))
+
+TUNING_SETTING = Gauge(
+    "cortex_tuning_setting", "Active encoder performance settings.", ["setting"]
+)
+TUNING_PROFILE = Info("cortex_tuning_profile", "Origin of the active tuning profile.")
+
+
+class TuningResult(BaseModel):
+    """Measured performance of one candidate configuration."""
+
+    batch_size: int
+    intra_op_threads: int
+    chunks_per_second: float
+    batch_latency_ms: float
+
+
+class TuningProfile(BaseModel):
+    """Encoder settings chosen for a host."""
+
+    model: str
+    batch_size: int
+    intra_op_threads: int
+    # Requests encode one model at a time, so inter-op parallelism only
+    # oversubscribes the cores shared by the serving workers.
+    inter_op_threads: int = 1
+    recommended_workers: int
+    chunks_per_second: float
+    batch_latency_ms: float
+    latency_bound_ms: float
+    cpu_count: int
+    created_at: datetime
+    results: list[TuningResult] = Field(default_factory=list)
+
+
+def synthetic_chunks(count: int, chunk_chars: int, seed: int = 0) -> list[str]:
+    """Generates deterministic pseudo-text chunks for benchmarking."""
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(
+            rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10))
+        )
+        for _ in range(2000)
+    ]
+    chunks: list[str] = []
+    for _ in range(count):
+        words: list[str] = []
+        length = 0
+        while length < chunk_chars:
+            word = rng.choice(vocabulary)
+            words.append(word)
+            length += len(word) + 1
+        chunks.append(" ".join(words)[:chunk_chars])
+    return chunks
+
+
+def thread_candidates(cpu_count: int) -> list[int]:
+    """Powers of two up to the core count, plus the core count itself."""
+    candidates = {cpu_count}
+    threads = 1
+    while threads < cpu_count:
+        candidates.add(threads)
+        threads *= 2
+    return sorted(candidates)
+
+
+def select_best(results: list[TuningResult], latency_bound_ms: float) -> TuningResult:
+    """
+    Picks the highest throughput within the latency bound, or the lowest
+    latency if no candidate meets it.
+    """
+    within_bound = [r for r in results if r.batch_latency_ms <= latency_bound_ms]
+    if within_bound:
+        return max(within_bound, key=lambda r: r.chunks_per_second)
+    return min(results, key=lambda r: r.batch_latency_ms)
+
+
+def calibrate(
+    model_name: str = validation.DEFAULT_MODEL,
+    latency_bound_ms: float = LATENCY_BOUND_MS,
+    batch_sizes: tuple[int, ...] = (8, 16, 32, 64, 128),
+    sample_chunks: int = 256,
+    chunk_chars: int = 1000,
+) -> TuningProfile:
+    """Benchmarks batch sizes and intra-op thread counts on this host."""
+    cpu_count = os.cpu_count() or 1
+    model = validation.REGISTRY.get(model_name)
+    texts = synthetic_chunks(sample_chunks, chunk_chars)
+    model.encode(texts[:8], convert_to_numpy=True)  # Warm up
+
+    original_threads = torch.get_num_threads()
+    results: list[TuningResult] = []
+    try:
+        for threads in thread_candidates(cpu_count):
+            torch.set_num_threads(threads)
+            for batch_size in batch_sizes:
+                start = time.perf_counter()
+                model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+                elapsed = time.perf_counter() - start
+                results.append(
+                    TuningResult(
+                        batch_size=batch_size,
+                        intra_op_threads=threads,
+                        chunks_per_second=len(texts) / elapsed,
+                        batch_latency_ms=elapsed
+                        / math.ceil(len(texts) / batch_size)
+                        * 1000,
+                    )
+                )
+    finally:
+        torch.set_num_threads(original_threads)
+
+    best = select_best(results, latency_bound_ms)
+    return TuningProfile(
+        model=model_name,
+        batch_size=best.batch_size,
+        intra_op_threads=best.intra_op_threads,
+        recommended_workers=max(1, cpu_count // best.intra_op_threads),
+        chunks_per_second=best.chunks_per_second,
+        batch_latency_ms=best.batch_latency_ms,
+        latency_bound_ms=latency_bound_ms,
+        cpu_count=cpu_count,
+        created_at=datetime.now(UTC),
+        results=results,
+    )
+
+
+def save_profile(profile: TuningProfile, path: str = PROFILE_PATH) -> None:
+    """Writes a profile to disk."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(profile.model_dump_json(indent=2))
+
+
+def load_profile(path: str = PROFILE_PATH) -> TuningProfile | None:
+    """Reads a saved profile, or returns None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return TuningProfile.model_validate_json(f.read())
+
+
+def profile_mismatch(profile: TuningProfile) -> str | None:
+    """
+    Explains why a saved profile does not fit this process, or returns None.
+
+    Profiles live on the shared model cache volume, so one can outlive a
+    model change or a new CPU limit.
+    """
+    if profile.model != validation.DEFAULT_MODEL:
+        return f"it was calibrated for model '{profile.model}'"
+    cpu_count = os.cpu_count() or 1
+    if profile.cpu_count != cpu_count:
+        return f"it was calibrated for {profile.cpu_count} CPUs, not {cpu_count}"
+    return None
+
+
+def apply_profile(profile: TuningProfile) -> None:
+    """Applies a profile's settings to this process."""
+    validation.ENCODE_BATCH_SIZE = profile.batch_size
+    torch.set_num_threads(profile.intra_op_threads)
+    try:
+        torch.set_num_interop_threads(profile.inter_op_threads)
+    except RuntimeError:
+        # Only possible before torch has started any inter-op work.
+        logger.warning("Could not set torch inter-op threads; keeping the default.")
+
+
+def publish_settings(source: str, profile: TuningProfile | None = None) -> None:
+    """Exposes the active settings on /metrics."""
+    TUNING_SETTING.labels("encode_batch_size").set(validation.ENCODE_BATCH_SIZE)
+    TUNING_SETTING.labels("intra_op_threads").set(torch.get_num_threads())
+    TUNING_SETTING.labels("inter_op_threads").set(torch.get_num_interop_threads())
+    if profile is not None:
+        TUNING_SETTING.labels("recommended_workers").set(profile.recommended_workers)
+        TUNING_SETTING.labels("calibrated_chunks_per_second").set(
+            profile.chunks_per_second
+        )
+    TUNING_PROFILE.info(
+        {
+            "source": source,
+            "model": profile.model if profile else validation.DEFAULT_MODEL,
+            "created_at": profile.created_at.isoformat() if profile else "",
+        }
+    )
+
+
+def configure_from_env() -> None:
+    """Applies the tuning behaviour selected by `CORTEX_AUTOTUNE` at startup."""
+    profile: TuningProfile | None = None
+    source = "defaults"
+    if AUTOTUNE_MODE in ("load", "calibrate"):
+        profile = load_profile()
+        reason = profile_mismatch(profile) if profile else None
+        if reason:
+            logger.warning(
+                "Ignoring tuning profile %s because %s.", PROFILE_PATH, reason
+            )
+            profile = None
+        source = "saved" if profile else source
+    if AUTOTUNE_MODE == "force" or (AUTOTUNE_MODE == "calibrate" and not profile):
+        profile = calibrate()
+        save_profile(profile)
+        source = "calibrated"
+    if profile is not None:
+        apply_profile(profile)
+    publish_settings(source, profile)
+
+
+def main() -> None:
+    """Command-line entry point that calibrates and saves a profile."""
+    parser = argparse.ArgumentParser(description="Calibrate encoder settings.")
+    parser.add_argument("--model", default=validation.DEFAULT_MODEL)
+    parser.add_argument("--latency-bound-ms", type=float, default=LATENCY_BOUND_MS)
+    parser.add_argument("--output", default=PROFILE_PATH)
+    args = parser.parse_args()
+
+    profile = calibrate(args.model, args.latency_bound_ms)
+    save_profile(profile, args.output)
+    print(profile.model_dump_json(indent=2, exclude={"results"}))
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,350 @@
 # Pylance strict mode
+import hashlib
+import os
+import random
+import statistics
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
 from typing import cast
 
 import numpy as np
 from numpy.typing import NDArray
+from prometheus_client import Counter, Gauge
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity  # type: ignore
 
-# Load the model once at startup. This is a critical optimization.
-# In a real production system, this would be managed more carefully.
-MODEL = SentenceTransformer("all-MiniLM-L6-v2")
+from .api_models import ValidationLevel, ValidationOptions, ValidationSummary
+from .deadlines import Deadline
 
+DEFAULT_MODEL: str = os.getenv("SENTENCE_TRANSFORMER_MODEL", "all-MiniLM-L6-v2")
+# Models that requests may select, in addition to the default one.
+ALLOWED_MODELS: frozenset[str] = frozenset(
+    name.strip()
+    for name in os.getenv("CORTEX_ALLOWED_MODELS", "").split(",")
+    if name.strip()
+) | {DEFAULT_MODEL}
+MODEL_MEMORY_BUDGET_MB: float = float(
+    os.getenv("CORTEX_MODEL_MEMORY_BUDGET_MB", "2048")
+)
+PIN_DEFAULT_MODEL: bool = (
+    os.getenv("CORTEX_PIN_DEFAULT_MODEL", "true").lower() == "true"
+)
+# Chunks per forward pass; may be replaced by a tuning profile at startup.
+ENCODE_BATCH_SIZE: int = int(os.getenv("CORTEX_ENCODE_BATCH_SIZE", "32"))
+# Number of chunk embeddings kept for reuse across requests; 0 disables it.
+EMBEDDING_CACHE_SIZE: int = int(os.getenv("CORTEX_EMBEDDING_CACHE_SIZE", "10000"))
+# Only load models that are already in the Hugging Face cache.
+MODEL_LOCAL_FILES_ONLY: bool = (
+    os.getenv("CORTEX_MODEL_LOCAL_FILES_ONLY", "false").lower() == "true"
+)
 
-def calculate_semantic_similarity(chunks: list[str]) -> list[float | None]:
+LOADED_MODELS = Gauge(
+    "cortex_loaded_models", "Embedding models currently held in memory."
+)
+LOADED_MODEL_BYTES = Gauge(
+    "cortex_loaded_model_bytes", "Estimated memory used by loaded embedding models."
+)
+MODEL_EVICTIONS = Counter(
+    "cortex_model_evictions_total",
+    "Embedding models evicted to stay under the memory budget.",
+    ["model"],
+)
+
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "cortex_embedding_cache_lookups_total",
+    "Chunk embedding cache lookups.",
+    ["result"],
+)
+
+
+class UnknownModelError(ValueError):
+    """Raised when a request selects a model that is not allowed."""
+
+
+def load_model(name: str) -> SentenceTransformer:
+    """Loads a sentence-transformers model, using the local cache if present."""
+    return SentenceTransformer(name, local_files_only=MODEL_LOCAL_FILES_ONLY)
+
+
+def model_size_bytes(model: SentenceTransformer) -> int:
+    """Estimates the memory held by a model's parameters and buffers."""
+    tensors = [*model.parameters(), *model.buffers()]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
     """
-    Calculates the cosine similarity between adjacent chunks.
-    The last chunk will have a similarity of None.
+    Loads embedding models on first use and keeps them under a memory budget.
+
+    Models are evicted in least-recently-used order once the budget is
+    exceeded. Pinned models are never evicted. A model being evicted while a
+    request is still encoding with it stays alive until that request ends.
+    """
+
+    def __init__(
+        self,
+        allowed: frozenset[str],
+        memory_budget_bytes: float,
+        pinned: frozenset[str] = frozenset(),
+        loader: Callable[[str], SentenceTransformer] = load_model,
+    ) -> None:
+        self._allowed = allowed
+        self._loader = loader
+        self._budget = memory_budget_bytes
+        self._pinned = pinned
+        self._models: OrderedDict[str, tuple[SentenceTransformer, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: dict[str, threading.Lock] = {
+            name: threading.Lock() for name in allowed
+        }
+
+    def check(self, name: str) -> None:
+        """
+        Verifies that a model may be used.
+
+        Raises:
+            UnknownModelError: If the model is not in the allowed list.
+        """
+        if name not in self._allowed:
+            raise UnknownModelError(f"Embedding model '{name}' is not available.")
+
+    def get(self, name: str) -> SentenceTransformer:
+        """
+        Returns the named model, loading it if needed.
+
+        Raises:
+            UnknownModelError: If the model is not in the allowed list.
+        """
+        self.check(name)
+
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name][0]
+
+        # Load outside the registry lock so other models stay usable.
+        with self._load_locks[name]:
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    return self._models[name][0]
+            model = self._loader(name)
+            size = model_size_bytes(model)
+            with self._lock:
+                self._models[name] = (model, size)
+                self._evict(keep=name)
+            return model
+
+    def loaded(self) -> list[str]:
+        """Returns the loaded model names, least recently used first."""
+        with self._lock:
+            return list(self._models)
+
+    def _evict(self, keep: str) -> None:
+        total = sum(size for _, size in self._models.values())
+        for name in list(self._models):
+            if total <= self._budget:
+                break
+            if name == keep or name in self._pinned:
+                continue
+            total -= self._models.pop(name)[1]
+            MODEL_EVICTIONS.labels(name).inc()
+        LOADED_MODELS.set(len(self._models))
+        LOADED_MODEL_BYTES.set(total)
+
+
+class EmbeddingCache:
+    """
+    LRU cache of chunk embeddings keyed by model and chunk text.
+
+    With content-defined chunking, an edited document produces mostly the
+    same chunks as before, so only the changed ones reach the encoder.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], NDArray[np.float64]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name: str, text: str) -> tuple[str, str]:
+        return model_name, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, model_name: str, text: str) -> NDArray[np.float64] | None:
+        if self._max_entries <= 0:
+            return None
+        key = self._key(model_name, text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+        EMBEDDING_CACHE_LOOKUPS.labels("hit" if embedding is not None else "miss").inc()
+        return embedding
+
+    def put(self, model_name: str, text: str, embedding: NDArray[np.float64]) -> None:
+        if self._max_entries <= 0:
+            return
+        key = self._key(model_name, text)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+EMBEDDING_CACHE = EmbeddingCache(EMBEDDING_CACHE_SIZE)
+
+REGISTRY = ModelRegistry(
+    ALLOWED_MODELS,
+    MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+    pinned=frozenset({DEFAULT_MODEL}) if PIN_DEFAULT_MODEL else frozenset(),
+)
+
+
+DEFAULT_SAMPLE_EVERY = 10
+
+
+def select_pairs(
+    total_pairs: int, options: ValidationOptions, seed: str
+) -> list[int] | None:
+    """
+    Returns the indices of the adjacent pairs to score, or None for all of them.
+
+    Pair `i` compares chunk `i` with chunk `i + 1`. Random sampling is seeded
+    so the same document always gets the same pairs.
+    """
+    if options.level == "full":
+        return None
+    if options.level == "none":
+        return []
+    if options.sample_fraction is not None:
+        rng = random.Random(seed)
+        count = max(1, round(total_pairs * options.sample_fraction))
+        return sorted(rng.sample(range(total_pairs), min(count, total_pairs)))
+    every = options.sample_every or DEFAULT_SAMPLE_EVERY
+    return list(range(0, total_pairs, every))
+
+
+def needed_chunks(num_chunks: int, pairs: list[int] | None) -> list[int]:
+    """Returns the chunks that must be encoded to score the given pairs."""
+    if pairs is None:
+        pairs = list(range(num_chunks - 1))
+    return sorted({i for pair in pairs for i in (pair, pair + 1)})
+
+
+def embed_chunks(
+    chunks: list[str],
+    indices: list[int],
+    model_name: str | None = None,
+    deadline: Deadline | None = None,
+) -> dict[int, NDArray[np.float64]]:
     """
-    if len(chunks) < 2:
-        return [None] * len(chunks)
+    Encodes the chunks at `indices`, keyed by chunk index. Chunks seen
+    before are served from the embedding cache.
 
-    embeddings = MODEL.encode(chunks, convert_to_numpy=True)
+    Chunks are encoded `ENCODE_BATCH_SIZE` at a time and `deadline` is
+    checked before every batch.
 
-    similarities: list[float | None] = []
-    for i in range(len(chunks) - 1):
-        embedding_current: NDArray[np.float64] = embeddings[i].reshape(1, -1)
-        embedding_next: NDArray[np.float64] = embeddings[i + 1].reshape(1, -1)
+    Raises:
+        WorkAbandonedError: If the deadline passes or the request is cancelled.
+    """
+    model_name = model_name or DEFAULT_MODEL
+    REGISTRY.check(model_name)
+    result: dict[int, NDArray[np.float64]] = {}
+    missing: list[int] = []
+    for i in indices:
+        cached = EMBEDDING_CACHE.get(model_name, chunks[i])
+        if cached is None:
+            missing.append(i)
+        else:
+            result[i] = cached
+    if not missing:
+        return result
 
-        # Use cast to handle sklearn's type ambiguity
-        similarity_score_array: NDArray[np.float64] = cast(
-            NDArray[np.float64], cosine_similarity(embedding_current, embedding_next)
+    model = REGISTRY.get(model_name)
+    for offset in range(0, len(missing), ENCODE_BATCH_SIZE):
+        if deadline is not None:
+            deadline.check("encode")
+        batch = missing[offset : offset + ENCODE_BATCH_SIZE]
+        embeddings = model.encode(
+            [chunks[i] for i in batch],
+            batch_size=ENCODE_BATCH_SIZE,
+            convert_to_numpy=True,
         )
+        # Cached per batch, so a retry of abandoned work reuses what was done.
+        for row, chunk_index in enumerate(batch):
+            result[chunk_index] = embeddings[row]
+            EMBEDDING_CACHE.put(model_name, chunks[chunk_index], embeddings[row])
+    return result
+
 
-        # Extract the similarity score safely
-        similarity_score: float = float(similarity_score_array[0, 0])
-        similarities.append(similarity_score)
+def cosine(a: NDArray[np.float64], b: NDArray[np.float64]) -> float:
+    """Cosine similarity between two embeddings."""
+    # Use cast to handle sklearn's type ambiguity
+    similarity_score_array: NDArray[np.float64] = cast(
+        NDArray[np.float64], cosine_similarity(a.reshape(1, -1), b.reshape(1, -1))
+    )
+    # Extract the similarity score safely
+    return float(similarity_score_array[0, 0])
 
-    similarities.append(None)  # Last chunk has no next chunk to compare to
+
+def pool_embeddings(embeddings: list[NDArray[np.float64]]) -> NDArray[np.float64]:
+    """Mean-pools embeddings into a single embedding for a larger span."""
+    return cast(NDArray[np.float64], np.mean(np.stack(embeddings), axis=0))
+
+
+def adjacent_similarities(
+    embeddings: dict[int, NDArray[np.float64]], num_chunks: int
+) -> list[float | None]:
+    """
+    Scores every adjacent pair whose embeddings are both available.
+    The last chunk, and pairs missing an embedding, get None.
+    """
+    similarities: list[float | None] = [None] * num_chunks
+    for i in range(num_chunks - 1):
+        if i in embeddings and i + 1 in embeddings:
+            similarities[i] = cosine(embeddings[i], embeddings[i + 1])
     return similarities
+
+
+def calculate_semantic_similarity(
+    chunks: list[str],
+    model_name: str | None = None,
+    pairs: list[int] | None = None,
+    deadline: Deadline | None = None,
+) -> list[float | None]:
+    """
+    Calculates the cosine similarity between adjacent chunks.
+    The last chunk will have a similarity of None.
+
+    If `pairs` is given, only those pairs are scored and only the chunks they
+    need are encoded; every other score is None.
+    """
+    embeddings = embed_chunks(
+        chunks, needed_chunks(len(chunks), pairs), model_name, deadline
+    )
+    similarities = adjacent_similarities(embeddings, len(chunks))
+    if pairs is not None:
+        # Neighbouring sampled pairs can make extra pairs computable; keep
+        # exactly the requested ones.
+        requested = set(pairs)
+        similarities = [
+            s if i in requested else None for i, s in enumerate(similarities)
+        ]
+    return similarities
+
+
+def summarize(
+    similarities: list[float | None], level: ValidationLevel
+) -> ValidationSummary:
+    """Computes summary statistics over the scores that were calculated."""
+    scores = [s for s in similarities if s is not None]
+    return ValidationSummary(
+        level=level,
+        scored_pairs=len(scores),
+        total_pairs=max(len(similarities) - 1, 0),
+        mean_similarity=statistics.fmean(scores) if scores else None,
+        min_similarity=min(scores) if scores else None,
+        max_similarity=max(scores) if scores else None,
+    )
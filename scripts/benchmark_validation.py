@@ -0,0 +1,74 @@
+# scripts/benchmark_validation.py
+# Pylance strict mode
+
+import os
+import time
+from typing import Any
+
+import requests
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+CORTEX_API_URL = os.getenv("CORTEX_API_URL", "http://127.0.0.1:8000/api/v1/sync")
+API_KEY = os.getenv("CORTEX_API_KEY")
+REQUESTS_PER_LEVEL = 5
+
+# Each entry is (label, validation options sent with the request)
+VALIDATION_LEVELS: list[tuple[str, dict[str, Any]]] = [
+    ("none", {"level": "none"}),
+    ("sampled (every 10th pair)", {"level": "sampled", "sample_every": 10}),
+    ("sampled (5% of pairs)", {"level": "sampled", "sample_fraction": 0.05}),
+    ("full", {"level": "full"}),
+]
+
+# A long synthetic document so that encoding dominates the request time
+SAMPLE_DOCUMENT = " ".join(
+    f"Sentence number {i} describes a step in the data pipeline." for i in range(5000)
+)
+
+
+def run_benchmark() -> None:
+    """
+    Sends the same document at every validation level and reports the
+    chunk throughput of each.
+    """
+    if not API_KEY:
+        print("Error: CORTEX_API_KEY not found in .env file. Aborting.")
+        return
+
+    headers: dict[str, str] = {
+        "Content-Type": "application/json",
+        "X-API-Key": API_KEY,
+    }
+
+    print(f"--- Validation Benchmark ({len(SAMPLE_DOCUMENT)} characters) ---")
+    for label, options in VALIDATION_LEVELS:
+        payload: dict[str, Any] = {
+            "document_id": "doc-validation-benchmark",
+            "content": SAMPLE_DOCUMENT,
+            "chunking_strategy": {
+                "name": "fixed_size",
+                "params": {"chunk_size": 500, "chunk_overlap": 50},
+            },
+            "validation": options,
+        }
+
+        total_chunks = 0
+        start = time.perf_counter()
+        for _ in range(REQUESTS_PER_LEVEL):
+            response = requests.post(
+                CORTEX_API_URL, headers=headers, json=payload, timeout=300
+            )
+            response.raise_for_status()
+            total_chunks += response.json()["metrics"]["total_chunks_produced"]
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"{label:<28} {total_chunks / elapsed:>10.1f} chunks/s "
+            f"{elapsed / REQUESTS_PER_LEVEL * 1000:>8.0f} ms/request"
+        )
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -1,5 +1,6 @@
 # scripts/client.py
 # Pylance strict mode
+# Run from the repository root: python -m scripts.client
 
 import json
 import os
@@ -8,10 +9,13 @@ from typing import Any, cast
 import requests
 from dotenv import load_dotenv
 
+from cortex_service.routing import CortexRouter
+
 # --- Configuration ---
 # Load environment variables (like CORTEX_API_KEY) from the .env file
 load_dotenv()
-CORTEX_API_URL = "http://127.0.0.1:8000/api/v1/sync"
+# Comma-separated base URLs; documents are spread over them by consistent hashing
+CORTEX_API_URLS = os.getenv("CORTEX_API_URLS", "http://127.0.0.1:8000").split(",")
 API_KEY = os.getenv("CORTEX_API_KEY")
 
 # --- Sample Data ---
@@ -53,10 +57,7 @@ def run_sync_simulation() -> None:
         print("Error: CORTEX_API_KEY not found in .env file. Aborting.")
         return
 
-    headers: dict[str, str] = {
-        "Content-Type": "application/json",
-        "X-API-Key": API_KEY,
-    }
+    router = CortexRouter(CORTEX_API_URLS, API_KEY)
 
     payload: dict[str, Any] = {
         "document_id": "doc-dockerfile-best-practice-001",
@@ -65,12 +66,11 @@ def run_sync_simulation() -> None:
         "chunking_strategy": {"name": "paragraph", "params": {"min_chunk_size": 30}},
     }
 
-    print(f"\n[1] Sending document '{payload['document_id']}' to Cortex service...")
+    node = router.endpoints_for(payload["document_id"])[0]
+    print(f"\n[1] Sending document '{payload['document_id']}' to {node}...")
 
     try:
-        response = requests.post(
-            CORTEX_API_URL, headers=headers, json=payload, timeout=30
-        )
+        response = router.sync_document(payload)
         response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
     except requests.exceptions.RequestException as e:
         print(f"\n[!] API Request Failed: {e}")
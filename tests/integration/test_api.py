@@ -2,8 +2,10 @@
 import os
 from typing import Any
 
+import pytest
 from fastapi.testclient import TestClient
 
+from cortex_service import deadlines, security
 from cortex_service.main import app
 
 client = TestClient(app)
@@ -103,3 +105,199 @@ def test_sync_batch_e2e_success() -> None:
     # Check results for the second document
     assert response_data["results"][1]["parent_document_id"] == "doc2"
     assert len(response_data["results"][1]["chunks"]) == 2
+
+
+def test_sync_batch_invalid_document() -> None:
+    """Tests that an invalid document in a batch is rejected with a 422."""
+    headers = {"X-API-Key": API_KEY}
+    payload: dict[str, Any] = {"documents": [{"document_id": "doc1"}]}
+    response = client.post("/api/v1/sync-batch", headers=headers, json=payload)
+
+    assert response.status_code == 422
+    assert response.json()["error_code"] == 4220
+
+
+def test_sync_batch_later_invalid_document() -> None:
+    """Tests that a failure after streaming started still yields valid JSON."""
+    headers = {"X-API-Key": API_KEY}
+    payload: dict[str, Any] = {
+        "documents": [
+            {
+                "document_id": "doc1",
+                "content": "Valid content for the first document.",
+                "chunking_strategy": {
+                    "name": "fixed_size",
+                    "params": {"chunk_size": 10},
+                },
+            },
+            {"document_id": "bad"},
+        ]
+    }
+    response = client.post("/api/v1/sync-batch", headers=headers, json=payload)
+    response_data = response.json()
+
+    assert response.status_code == 200
+    assert response_data["total_documents_processed"] == 1
+    assert response_data["results"][0]["parent_document_id"] == "doc1"
+    assert response_data["error"]["error_code"] == 4220
+
+
+def test_sync_batch_garbage_between_documents() -> None:
+    """Tests that a body that is not valid JSON is rejected."""
+    headers = {"X-API-Key": API_KEY, "Content-Type": "application/json"}
+    body = b'{"documents": [{"document_id": "a"} GARBAGE]} trailing'
+    response = client.post("/api/v1/sync-batch", headers=headers, content=body)
+
+    assert response.status_code == 422
+    assert response.json()["error_code"] == 4220
+
+
+def test_sync_throttled_when_budget_exhausted(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that a client over its work budget is rejected with a 429."""
+    tiny = security.ApiClient.model_validate(
+        {"name": "tiny", "key": "tiny-key", "rate": 0.001, "burst": 10}
+    )
+    monkeypatch.setitem(security.API_CLIENTS, tiny.key, tiny)
+    headers = {"X-API-Key": tiny.key}
+    payload = {
+        "document_id": "doc-big",
+        "content": "x" * 100,
+        "chunking_strategy": {"name": "fixed_size", "params": {"chunk_size": 50}},
+    }
+
+    first = client.post("/api/v1/sync", headers=headers, json=payload)
+    second = client.post("/api/v1/sync", headers=headers, json=payload)
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.json()["error_code"] == 4290
+    assert "Retry-After" in second.headers
+
+
+def test_sync_unknown_embedding_model() -> None:
+    """Tests that selecting a model that is not allowed is rejected with a 422."""
+    headers = {"X-API-Key": API_KEY}
+    payload = {
+        "document_id": "doc-model",
+        "content": "Some content.",
+        "chunking_strategy": {"name": "fixed_size"},
+        "embedding_model": "not-an-allowed-model",
+    }
+    response = client.post("/api/v1/sync", headers=headers, json=payload)
+
+    assert response.status_code == 422
+    assert "not-an-allowed-model" in response.json()["details"]
+
+
+def test_sync_conflicting_sampling_options() -> None:
+    """Tests that sample_every and sample_fraction together are rejected."""
+    headers = {"X-API-Key": API_KEY}
+    payload = {
+        "document_id": "doc-sampled",
+        "content": "x" * 100,
+        "chunking_strategy": {"name": "fixed_size", "params": {"chunk_size": 10}},
+        "validation": {"level": "sampled", "sample_every": 2, "sample_fraction": 0.5},
+    }
+    response = client.post("/api/v1/sync", headers=headers, json=payload)
+    assert response.status_code == 422
+
+
+def test_inconsistent_content_defined_sizes() -> None:
+    """Tests that both endpoints reject content_defined sizes out of order."""
+    headers = {"X-API-Key": API_KEY}
+    payload = {
+        "document_id": "doc-cdc",
+        "content": "x" * 100,
+        # The default min_chunk_size of 50 is above this target.
+        "chunking_strategy": {
+            "name": "content_defined",
+            "params": {"target_chunk_size": 40},
+        },
+    }
+    response = client.post("/api/v1/sync", headers=headers, json=payload)
+    assert response.status_code == 422
+    response = client.post(
+        "/api/v1/sync-batch", headers=headers, json={"documents": [payload]}
+    )
+    assert response.status_code == 422
+    assert response.json()["error_code"] == 4220
+
+
+def test_sync_validation_level_none() -> None:
+    """Tests that validation can be skipped, leaving every score null."""
+    headers = {"X-API-Key": API_KEY}
+    payload = {
+        "document_id": "doc-no-validation",
+        "content": "abcdefghij" * 10,
+        "chunking_strategy": {
+            "name": "fixed_size",
+            "params": {"chunk_size": 20, "chunk_overlap": 0},
+        },
+        "validation": {"level": "none"},
+    }
+    response = client.post("/api/v1/sync", headers=headers, json=payload)
+    response_data = response.json()
+
+    assert response.status_code == 200
+    assert len(response_data["chunks"]) == 5
+    assert all(
+        chunk["metadata"]["validation"]["similarity_with_next_chunk"] is None
+        for chunk in response_data["chunks"]
+    )
+    assert response_data["validation_summary"]["scored_pairs"] == 0
+    assert response_data["validation_summary"]["total_pairs"] == 4
+
+
+def test_sync_deadline_exceeded() -> None:
+    """Tests that work past the client's deadline is abandoned with a 504."""
+    headers = {"X-API-Key": API_KEY, "X-Request-Timeout-Ms": "0.001"}
+    payload = {
+        "document_id": "doc-late",
+        "content": "Some text that nobody is waiting for anymore.",
+        "chunking_strategy": {"name": "fixed_size", "params": {"chunk_size": 10}},
+    }
+    response = client.post("/api/v1/sync", headers=headers, json=payload)
+    assert response.status_code == 504
+    assert response.json()["error_code"] == 5040
+
+
+def test_sync_batch_deadline_exceeded() -> None:
+    """Tests that an expired batch is abandoned before streaming starts."""
+    headers = {"X-API-Key": API_KEY, "X-Request-Timeout-Ms": "0.001"}
+    payload = {
+        "documents": [
+            {
+                "document_id": "doc-late",
+                "content": "Some text that nobody is waiting for anymore.",
+                "chunking_strategy": {
+                    "name": "fixed_size",
+                    "params": {"chunk_size": 10},
+                },
+            }
+        ]
+    }
+    response = client.post("/api/v1/sync-batch", headers=headers, json=payload)
+    assert response.status_code == 504
+    assert response.json()["error_code"] == 5040
+
+
+def test_sync_batch_has_no_default_deadline(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that the default deadline only applies to single documents."""
+    monkeypatch.setattr(deadlines, "DEFAULT_TIMEOUT_SECONDS", 0.0)
+    headers = {"X-API-Key": API_KEY}
+    document = {
+        "document_id": "doc-bulk",
+        "content": "A long backfill that must not be cut off by the default.",
+        "chunking_strategy": {"name": "fixed_size", "params": {"chunk_size": 10}},
+    }
+
+    response = client.post("/api/v1/sync", headers=headers, json=document)
+    assert response.status_code == 504
+
+    response = client.post(
+        "/api/v1/sync-batch", headers=headers, json={"documents": [document] * 3}
+    )
+    response_data = response.json()
+    assert response.status_code == 200
+    assert response_data["total_documents_processed"] == 3
+    assert "error" not in response_data or response_data["error"] is None
@@ -0,0 +1,23 @@
+# Pylance strict mode
+from typing import cast
+
+import pytest
+from sentence_transformers import SentenceTransformer
+
+from cortex_service import validation
+
+from .fakes import RecordingModel
+
+
+@pytest.fixture
+def model(monkeypatch: pytest.MonkeyPatch) -> RecordingModel:
+    fake = RecordingModel()
+    registry = validation.ModelRegistry(
+        frozenset({validation.DEFAULT_MODEL}),
+        memory_budget_bytes=float("inf"),
+        loader=lambda name: cast(SentenceTransformer, fake),
+    )
+    monkeypatch.setattr(validation, "REGISTRY", registry)
+    monkeypatch.setattr(validation, "EMBEDDING_CACHE", validation.EmbeddingCache(100))
+    monkeypatch.setattr(validation, "model_size_bytes", lambda m: 0)
+    return fake
@@ -0,0 +1,16 @@
+# Pylance strict mode
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+class RecordingModel:
+    """Embeds text by its length and records what was encoded."""
+
+    def __init__(self) -> None:
+        self.encoded: list[str] = []
+
+    def encode(self, chunks: list[str], **kwargs: Any) -> NDArray[np.float64]:
+        self.encoded.extend(chunks)
+        return np.array([[len(c), 1.0] for c in chunks], dtype=np.float64)
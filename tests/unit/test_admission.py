@@ -0,0 +1,241 @@
+# Pylance strict mode
+import asyncio
+
+import pytest
+
+from cortex_service.admission import (
+    CHUNK_WORK_UNITS,
+    FairScheduler,
+    TokenBucket,
+    charge,
+    estimate_work,
+)
+from cortex_service.api_models import DocumentProcessRequest
+from cortex_service.deadlines import (
+    Deadline,
+    DeadlineExceededError,
+    RequestCancelledError,
+)
+from cortex_service.security import ApiClient
+
+
+def _client(name: str, weight: float = 1.0) -> ApiClient:
+    return ApiClient.model_validate({"name": name, "key": name, "weight": weight})
+
+
+def _request(content: str, name: str = "fixed_size") -> DocumentProcessRequest:
+    return DocumentProcessRequest.model_validate(
+        {
+            "document_id": "doc",
+            "content": content,
+            "chunking_strategy": {
+                "name": name,
+                "params": {"chunk_size": 10, "chunk_overlap": 0},
+            },
+        }
+    )
+
+
+async def _run_queued(items: list[tuple[str, float, float]]) -> list[str]:
+    """Queues (client, weight, cost) items behind the first one and runs them."""
+    scheduler = FairScheduler(capacity=1)
+    release = asyncio.Event()
+    order: list[str] = []
+
+    async def run(client: ApiClient, cost: float, hold: bool) -> None:
+        async with scheduler.slot(client, cost):
+            order.append(client.name)
+            if hold:
+                await release.wait()
+
+    tasks: list[asyncio.Task[None]] = []
+    for i, (name, weight, cost) in enumerate(items):
+        tasks.append(asyncio.create_task(run(_client(name, weight), cost, i == 0)))
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*tasks)
+    return order
+
+
+class TestEstimateWork:
+    """Test suite for estimate_work function."""
+
+    def test_fixed_size(self) -> None:
+        """Tests that fixed-size chunks are counted from the step size."""
+        assert estimate_work(_request("a" * 25)) == 25 + 3 * CHUNK_WORK_UNITS
+
+    def test_paragraph(self) -> None:
+        """Tests that paragraph chunks are counted from blank lines."""
+        content = "One.\n\nTwo.\n\nThree."
+        assert estimate_work(_request(content, "paragraph")) == (
+            len(content) + 3 * CHUNK_WORK_UNITS
+        )
+
+    def test_stage_shares(self) -> None:
+        """Tests that the chunk and encode shares add up to the whole cost."""
+        request = _request("a" * 25)
+        assert estimate_work(request, "chunk") == 25
+        assert estimate_work(request, "encode") == 3 * CHUNK_WORK_UNITS
+
+
+class TestTokenBucket:
+    """Test suite for TokenBucket."""
+
+    def test_admits_until_in_debt(self) -> None:
+        """Tests that work larger than the burst is charged in full."""
+        bucket = TokenBucket(rate=1.0, burst=100.0)
+        assert bucket.retry_after() == 0.0
+        bucket.consume(150.0)
+        assert bucket.retry_after() == pytest.approx(50.0, abs=0.1)
+
+    def test_debt_is_capped(self) -> None:
+        """Tests that retry_after never exceeds the maximum wait."""
+        bucket = TokenBucket(rate=1.0, burst=100.0, max_wait=60.0)
+        bucket.consume(1_000_000.0)
+        assert bucket.retry_after() == pytest.approx(60.0, abs=0.1)
+
+
+class TestCharge:
+    """Test suite for charge function."""
+
+    def test_waits_for_budget(self) -> None:
+        """Tests that a document of an admitted batch waits for the budget."""
+        client = ApiClient.model_validate(
+            {"name": "charge-wait", "key": "k", "rate": 10_000.0, "burst": 100.0}
+        )
+        request = _request("a" * 25)  # Costs 793 work units.
+
+        async def charge_twice() -> float:
+            await charge(client, request)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await charge(client, request)
+            return loop.time() - started
+
+        waited = asyncio.run(charge_twice())
+        assert waited == pytest.approx(0.0693, abs=0.03)
+
+    def test_cancelled_while_throttled(self) -> None:
+        """Tests that a cancelled request stops waiting and is not charged."""
+        client = ApiClient.model_validate(
+            {"name": "charge-cancel", "key": "k", "rate": 1.0, "burst": 1.0}
+        )
+        deadline = Deadline(60.0)
+
+        async def charge_after_cancel() -> None:
+            await charge(client, _request("a" * 25))
+            asyncio.get_running_loop().call_later(0.05, deadline.cancel)
+            await charge(client, _request("a" * 25), deadline)
+
+        with pytest.raises(RequestCancelledError) as excinfo:
+            asyncio.run(charge_after_cancel())
+        assert excinfo.value.stage == "throttle"
+
+
+class TestFairScheduler:
+    """Test suite for FairScheduler."""
+
+    def test_light_client_overtakes_bulk_backlog(self) -> None:
+        """Tests that a small item is not stuck behind queued bulk work."""
+        order = asyncio.run(
+            _run_queued(
+                [("bulk", 1.0, 1000.0)] * 3 + [("light", 1.0, 10.0)],
+            )
+        )
+        assert order == ["bulk", "light", "bulk", "bulk"]
+
+    def test_weight_shares_capacity(self) -> None:
+        """Tests that a heavier weight gets proportionally more turns."""
+        order = asyncio.run(
+            _run_queued([("normal", 1.0, 100.0)] * 3 + [("heavy", 2.0, 100.0)] * 4)
+        )
+        assert order == [
+            "normal",
+            "heavy",
+            "heavy",
+            "heavy",
+            "normal",
+            "heavy",
+            "normal",
+        ]
+
+    def test_cancelled_waiter_releases_slot(self) -> None:
+        """Tests that cancelling a queued item does not leak capacity."""
+
+        async def scenario() -> bool:
+            scheduler = FairScheduler(capacity=1)
+            client = _client("a")
+            release = asyncio.Event()
+
+            async def hold() -> None:
+                async with scheduler.slot(client, 1.0):
+                    await release.wait()
+
+            async def wait() -> None:
+                async with scheduler.slot(client, 1.0):
+                    pass
+
+            holder = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(wait())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            release.set()
+            await holder
+            async with scheduler.slot(client, 1.0):
+                return True
+
+        assert asyncio.run(scenario())
+
+    def test_expired_waiter_leaves_queue(self) -> None:
+        """Tests that a queued item gives up once its deadline passes."""
+
+        async def scenario() -> None:
+            scheduler = FairScheduler(capacity=1)
+            client = _client("a")
+            release = asyncio.Event()
+
+            async def hold() -> None:
+                async with scheduler.slot(client, 1.0):
+                    await release.wait()
+
+            holder = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            with pytest.raises(DeadlineExceededError):
+                async with scheduler.slot(client, 1.0, Deadline(0.01)):
+                    pass
+            release.set()
+            await holder
+            async with scheduler.slot(client, 1.0):
+                pass
+
+        asyncio.run(scenario())
+
+    def test_slot_skips_cancelled_waiter(self) -> None:
+        """Tests that a freed slot goes to a request that can still succeed."""
+
+        async def scenario() -> list[str]:
+            scheduler = FairScheduler(capacity=1)
+            release = asyncio.Event()
+            abandoned = Deadline(60)
+            order: list[str] = []
+
+            async def run(name: str, deadline: Deadline | None = None) -> None:
+                async with scheduler.slot(_client(name), 1.0, deadline):
+                    order.append(name)
+                    await release.wait()
+
+            holder = asyncio.create_task(run("holder"))
+            await asyncio.sleep(0)
+            gone = asyncio.create_task(run("gone", abandoned))
+            await asyncio.sleep(0)
+            live = asyncio.create_task(run("live"))
+            await asyncio.sleep(0)
+            abandoned.cancel()
+            release.set()
+            await asyncio.gather(holder, live)
+            with pytest.raises(RequestCancelledError):
+                await gone
+            return order
+
+        assert asyncio.run(scenario()) == ["holder", "live"]
@@ -1,7 +1,16 @@
 # Pylance strict mode
+import random
+
 import pytest
+from pydantic import ValidationError
 
-from cortex_service.chunking import chunk_by_fixed_size, chunk_by_paragraph
+from cortex_service.api_models import ChunkingStrategy
+from cortex_service.chunking import (
+    chunk_by_content,
+    chunk_by_fixed_size,
+    chunk_by_paragraph,
+    chunk_hierarchically,
+)
 
 
 class TestChunkByParagraph:
@@ -207,3 +216,98 @@ class TestChunkByFixedSize:
         assert chunks[0] == "Hello "
         assert chunks[1] == "o 世界! "
         assert chunks[2] == "! 🌍"
+
+
+class TestChunkHierarchically:
+    """Test suite for chunk_hierarchically function."""
+
+    def test_chunk_hierarchically_basic(self) -> None:
+        """Tests that parents are split into children."""
+        text = "abcdefghijkl"
+        tree = chunk_hierarchically(
+            text, parent_chunk_size=6, chunk_size=3, chunk_overlap=0
+        )
+        assert tree == [("abcdef", ["abc", "def"]), ("ghijkl", ["ghi", "jkl"])]
+
+    def test_chunk_hierarchically_children_stay_in_parent(self) -> None:
+        """Tests that child overlap never crosses a parent boundary."""
+        text = "abcdefgh"
+        tree = chunk_hierarchically(
+            text, parent_chunk_size=4, chunk_size=3, chunk_overlap=1
+        )
+        assert tree == [("abcd", ["abc", "cd"]), ("efgh", ["efg", "gh"])]
+
+    def test_chunk_hierarchically_empty_text(self) -> None:
+        """Tests handling of empty text."""
+        assert chunk_hierarchically("", 10, 5, 1) == []
+
+
+def _sample_text(words: int = 5000, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    vocabulary = ["lorem", "ipsum", "dolor", "sit", "amet", "data", "chunk", "index"]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+class TestChunkByContent:
+    """Test suite for chunk_by_content function."""
+
+    def test_chunk_by_content_reassembles_text(self) -> None:
+        """Tests that chunks cover the text exactly once, in order."""
+        text = _sample_text()
+        chunks = chunk_by_content(text, min_size=64, target_size=256, max_size=1024)
+        assert "".join(chunks) == text
+
+    def test_chunk_by_content_respects_sizes(self) -> None:
+        """Tests min and max sizes, except for a short final chunk."""
+        chunks = chunk_by_content(
+            _sample_text(), min_size=64, target_size=256, max_size=1024
+        )
+        assert all(64 <= len(chunk) <= 1024 for chunk in chunks[:-1])
+        assert len(chunks[-1]) <= 1024
+
+    def test_chunk_by_content_is_edit_stable(self) -> None:
+        """Tests that inserting at the start only changes the first chunk."""
+        text = _sample_text()
+        before = chunk_by_content(text, min_size=64, target_size=256, max_size=1024)
+        after = chunk_by_content(
+            "X" + text, min_size=64, target_size=256, max_size=1024
+        )
+        assert len(set(before) - set(after)) <= 2
+        assert before[-10:] == after[-10:]
+
+    def test_chunk_by_content_empty_text(self) -> None:
+        """Tests handling of empty text."""
+        assert chunk_by_content("", min_size=1, target_size=2, max_size=3) == []
+
+    def test_chunk_by_content_invalid_sizes(self) -> None:
+        """Tests that inconsistent sizes raise ValueError."""
+        with pytest.raises(ValueError, match="min_size <= target_size <= max_size"):
+            chunk_by_content("test", min_size=10, target_size=5, max_size=20)
+
+
+class TestChunkingStrategy:
+    """Test suite for ChunkingStrategy."""
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"target_chunk_size": 40},
+            {"min_chunk_size": 0, "target_chunk_size": 40},
+            {"target_chunk_size": 5000},
+        ],
+    )
+    def test_rejects_inconsistent_content_defined_sizes(
+        self, params: dict[str, int]
+    ) -> None:
+        """Tests that content_defined sizes are checked when parsed."""
+        with pytest.raises(ValidationError):
+            ChunkingStrategy.model_validate(
+                {"name": "content_defined", "params": params}
+            )
+
+    def test_ignores_sizes_of_other_strategies(self) -> None:
+        """Tests that content_defined sizes only apply to content_defined."""
+        strategy = ChunkingStrategy.model_validate(
+            {"name": "fixed_size", "params": {"target_chunk_size": 40}}
+        )
+        assert strategy.params.target_chunk_size == 40
@@ -0,0 +1,48 @@
+# Pylance strict mode
+import pytest
+from prometheus_client import REGISTRY
+
+from cortex_service.deadlines import (
+    Deadline,
+    DeadlineExceededError,
+    RequestCancelledError,
+)
+
+
+def _cancelled_count(reason: str, stage: str) -> float:
+    value = REGISTRY.get_sample_value(
+        "cortex_cancelled_work_total", {"reason": reason, "stage": stage}
+    )
+    return value or 0.0
+
+
+class TestDeadline:
+    """Test suite for Deadline."""
+
+    def test_open_deadline_passes(self) -> None:
+        """Tests that work continues while time is left."""
+        deadline = Deadline(60)
+        deadline.check("chunk")
+        assert not deadline.abandoned
+
+    def test_expired_deadline_raises_and_counts(self) -> None:
+        """Tests that an expired deadline stops work and is counted."""
+        before = _cancelled_count("deadline", "encode")
+        deadline = Deadline(0)
+        with pytest.raises(DeadlineExceededError) as error:
+            deadline.check("encode")
+        assert error.value.stage == "encode"
+        assert _cancelled_count("deadline", "encode") == before + 1
+
+    def test_cancelled_request_raises(self) -> None:
+        """Tests that a cancelled request stops work."""
+        deadline = Deadline(60)
+        deadline.cancel()
+        assert deadline.abandoned
+        with pytest.raises(RequestCancelledError):
+            deadline.check("chunk")
+
+    def test_default_timeout(self) -> None:
+        """Tests that requests without a timeout get the default one."""
+        assert Deadline.from_timeout_ms(None).remaining() > 1
+        assert Deadline.from_timeout_ms(500).remaining() <= 0.5
@@ -0,0 +1,87 @@
+# Pylance strict mode
+import json
+from typing import Any
+
+import pytest
+
+from cortex_service.json_stream import DocumentStreamParser
+
+
+def _feed_in_pieces(body: bytes, piece_size: int) -> list[dict[str, Any]]:
+    parser = DocumentStreamParser()
+    items: list[dict[str, Any]] = []
+    for i in range(0, len(body), piece_size):
+        items.extend(parser.feed(body[i : i + piece_size]))
+    items.extend(parser.close())
+    return items
+
+
+class TestDocumentStreamParser:
+    """Test suite for DocumentStreamParser."""
+
+    def test_parses_whole_body(self) -> None:
+        """Tests that all documents are returned from a single feed."""
+        docs = [{"document_id": "a"}, {"document_id": "b"}]
+        body = json.dumps({"documents": docs}).encode()
+        assert _feed_in_pieces(body, len(body)) == docs
+
+    @pytest.mark.parametrize("piece_size", [1, 2, 3, 7])
+    def test_parses_byte_by_byte(self, piece_size: int) -> None:
+        """Tests documents split across arbitrary chunk boundaries."""
+        docs = [
+            {"document_id": "a", "content": 'Braces } and [ quotes " inside \\ text.'},
+            {"document_id": "b", "content": "Unicode 世界 🌍", "metadata": {"x": [1]}},
+        ]
+        body = json.dumps({"documents": docs}, ensure_ascii=False).encode("utf-8")
+        assert _feed_in_pieces(body, piece_size) == docs
+
+    def test_yields_documents_as_they_complete(self) -> None:
+        """Tests that a document is emitted before the body has ended."""
+        parser = DocumentStreamParser()
+        assert parser.feed(b'{"documents": [{"document_id": "a"}') == [
+            {"document_id": "a"}
+        ]
+        assert parser.feed(b', {"document_id": "b"}]}') == [{"document_id": "b"}]
+        assert parser.close() == []
+
+    def test_ignores_other_keys(self) -> None:
+        """Tests that only the documents array is extracted."""
+        body = b'{"note": "documents", "other": [{"x": 1}], "documents": [{"y": 2}]}'
+        assert _feed_in_pieces(body, 4) == [{"y": 2}]
+
+    def test_empty_documents(self) -> None:
+        """Tests an empty documents array."""
+        assert _feed_in_pieces(b'{"documents": []}', 5) == []
+
+    def test_missing_documents_raises(self) -> None:
+        """Tests that a body without a documents array is rejected."""
+        with pytest.raises(ValueError, match="no 'documents' array"):
+            _feed_in_pieces(b"{}", 1)
+
+    def test_truncated_body_raises(self) -> None:
+        """Tests that a truncated body is rejected."""
+        with pytest.raises(ValueError, match="not a complete JSON object"):
+            _feed_in_pieces(b'{"documents": [{"document_id": "a"}', 8)
+
+    def test_malformed_document_raises(self) -> None:
+        """Tests that an invalid document object is rejected."""
+        with pytest.raises(ValueError, match="Malformed document"):
+            _feed_in_pieces(b'{"documents": [{"document_id": }]}', 8)
+
+    @pytest.mark.parametrize(
+        ("body", "message"),
+        [
+            (b'{"documents": [{"a": 1} GARBAGE {"b": 2}]}', "must be an object"),
+            (b'{"documents": ["a"]}', "must be an object"),
+            (b'{"documents": [{"a": 1} {"b": 2}]}', "Missing comma"),
+            (b'{"documents": [{"a": 1},]}', "Trailing comma"),
+            (b'{"documents": [{"a": 1}]} trailing junk', "outside the top-level"),
+            (b'{"documents": []} {"documents": [{"a": 1}]}', "outside the top-level"),
+            (b'{"documents": [{"a": 1}], GARBAGE}', "not valid JSON"),
+        ],
+    )
+    def test_invalid_structure_raises(self, body: bytes, message: str) -> None:
+        """Tests that anything but valid JSON around the documents is rejected."""
+        for piece_size in (1, 5, len(body)):
+            with pytest.raises(ValueError, match=message):
+                _feed_in_pieces(body, piece_size)
@@ -0,0 +1,82 @@
+# Pylance strict mode
+from typing import cast
+
+import pytest
+from sentence_transformers import SentenceTransformer
+
+from cortex_service.validation import ModelRegistry, UnknownModelError
+
+MB = 1024 * 1024
+
+
+class _FakeTensor:
+    def __init__(self, size: int) -> None:
+        self._size = size
+
+    def numel(self) -> int:
+        return self._size
+
+    def element_size(self) -> int:
+        return 1
+
+
+class _FakeModel:
+    def __init__(self, name: str, size: int) -> None:
+        self.name = name
+        self._size = size
+
+    def parameters(self) -> list[_FakeTensor]:
+        return [_FakeTensor(self._size)]
+
+    def buffers(self) -> list[_FakeTensor]:
+        return []
+
+
+def _registry(
+    budget_mb: float, pinned: frozenset[str] = frozenset()
+) -> tuple[ModelRegistry, list[str]]:
+    loads: list[str] = []
+
+    def loader(name: str) -> SentenceTransformer:
+        loads.append(name)
+        return cast(SentenceTransformer, _FakeModel(name, 100 * MB))
+
+    registry = ModelRegistry(
+        frozenset({"a", "b", "c"}), budget_mb * MB, pinned=pinned, loader=loader
+    )
+    return registry, loads
+
+
+class TestModelRegistry:
+    """Test suite for ModelRegistry."""
+
+    def test_loads_once(self) -> None:
+        """Tests that a model is loaded on first use and then reused."""
+        registry, loads = _registry(budget_mb=1000)
+        first = registry.get("a")
+        assert registry.get("a") is first
+        assert loads == ["a"]
+
+    def test_unknown_model_raises(self) -> None:
+        """Tests that models outside the allowed list are rejected."""
+        registry, loads = _registry(budget_mb=1000)
+        with pytest.raises(UnknownModelError):
+            registry.get("not-allowed")
+        assert loads == []
+
+    def test_evicts_least_recently_used(self) -> None:
+        """Tests LRU eviction once the memory budget is exceeded."""
+        registry, _ = _registry(budget_mb=250)
+        registry.get("a")
+        registry.get("b")
+        registry.get("a")
+        registry.get("c")
+        assert registry.loaded() == ["a", "c"]
+
+    def test_pinned_model_is_kept(self) -> None:
+        """Tests that a pinned model survives eviction."""
+        registry, _ = _registry(budget_mb=150, pinned=frozenset({"a"}))
+        registry.get("a")
+        registry.get("b")
+        registry.get("c")
+        assert registry.loaded() == ["a", "c"]
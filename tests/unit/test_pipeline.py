@@ -0,0 +1,149 @@
+# Pylance strict mode
+import asyncio
+import json
+import threading
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import pytest
+
+from cortex_service import pipeline, services
+from cortex_service.api_models import DocumentProcessRequest
+
+
+async def _body(payload: dict[str, Any]) -> AsyncIterator[bytes]:
+    yield json.dumps(payload).encode()
+
+
+def _documents(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "document_id": str(i),
+            "content": "a" * 30,
+            "chunking_strategy": {"name": "fixed_size", "params": {"chunk_size": 10}},
+        }
+        for i in range(count)
+    ]
+
+
+async def _collect(stream: AsyncIterator[bytes]) -> dict[str, Any]:
+    parts = [part async for part in stream]
+    result: dict[str, Any] = json.loads(b"".join(parts))
+    return result
+
+
+class TestStreamBatchResponse:
+    """Test suite for stream_batch_response function."""
+
+    def test_gate_covers_chunking_and_encoding(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Tests that no CPU-bound work runs outside its stage's gate."""
+        held: set[str] = set()
+        ran_outside: list[str] = []
+        chunk_document = services.chunk_document
+
+        def record_chunk(request: DocumentProcessRequest) -> services.ChunkedDocument:
+            if "chunk" not in held:
+                ran_outside.append("chunk")
+            return chunk_document(request)
+
+        def record_score(*args: Any, **kwargs: Any) -> list[float | None]:
+            if "encode" not in held:
+                ran_outside.append("encode")
+            return [None] * len(args[1].texts)
+
+        monkeypatch.setattr(services, "chunk_document", record_chunk)
+        monkeypatch.setattr(services, "score_chunks", record_score)
+
+        @asynccontextmanager
+        async def gate(
+            request: DocumentProcessRequest, stage: str
+        ) -> AsyncIterator[None]:
+            held.add(stage)
+            try:
+                yield
+            finally:
+                held.remove(stage)
+
+        document = {
+            "document_id": "doc",
+            "content": "a" * 30,
+            "chunking_strategy": {"name": "fixed_size", "params": {"chunk_size": 10}},
+        }
+        admitted: list[str] = []
+
+        async def admit(request: DocumentProcessRequest) -> None:
+            admitted.append(request.document_id)
+
+        stream = pipeline.stream_batch_response(
+            _body({"documents": [document] * 3}), admit=admit, gate=gate
+        )
+        result = asyncio.run(_collect(stream))
+
+        assert result["total_documents_processed"] == 3
+        assert ran_outside == []
+        assert admitted == ["doc"] * 3
+
+    def test_in_flight_documents_are_bounded(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Tests that parsed but unwritten documents never exceed max_in_flight."""
+
+        def slow_score(*args: Any, **kwargs: Any) -> list[float | None]:
+            time.sleep(0.01)
+            return [None] * len(args[1].texts)
+
+        monkeypatch.setattr(services, "score_chunks", slow_score)
+        in_flight = 0
+        peak = 0
+
+        async def admit(request: DocumentProcessRequest) -> None:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+
+        async def consume() -> int:
+            nonlocal in_flight
+            written = 0
+            stream = pipeline.stream_batch_response(
+                _body({"documents": _documents(12)}), max_in_flight=3, admit=admit
+            )
+            async for part in stream:
+                if not part.startswith(b"]"):
+                    in_flight -= 1
+                    written += 1
+                # A slow reader lets the upstream stages run ahead.
+                await asyncio.sleep(0.02)
+            return written
+
+        assert asyncio.run(consume()) == 12
+        assert peak == 3
+
+    def test_chunking_overlaps_encoding(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Tests that the next document is chunked while one is being encoded."""
+        chunk_started = [threading.Event() for _ in range(4)]
+        overlapped: list[bool] = []
+        chunk_document = services.chunk_document
+
+        def record_chunk(request: DocumentProcessRequest) -> services.ChunkedDocument:
+            chunk_started[int(request.document_id)].set()
+            return chunk_document(request)
+
+        def wait_for_next(*args: Any, **kwargs: Any) -> list[float | None]:
+            index = int(args[0].document_id)
+            if index + 1 < len(chunk_started):
+                # Blocks encoding until the next document's chunking starts.
+                overlapped.append(chunk_started[index + 1].wait(timeout=2))
+            return [None] * len(args[1].texts)
+
+        monkeypatch.setattr(services, "chunk_document", record_chunk)
+        monkeypatch.setattr(services, "score_chunks", wait_for_next)
+
+        stream = pipeline.stream_batch_response(_body({"documents": _documents(4)}))
+        result = asyncio.run(_collect(stream))
+
+        assert result["total_documents_processed"] == 4
+        assert overlapped == [True, True, True]
@@ -0,0 +1,246 @@
+# Pylance strict mode
+from collections import Counter
+from typing import Any, cast
+
+import pytest
+import requests
+
+from cortex_service import deadlines
+from cortex_service.routing import TIMEOUT_HEADER, CortexRouter, HashRing
+
+NODES = ["http://node-a:8000", "http://node-b:8000", "http://node-c:8000"]
+KEYS = [f"doc-{i}" for i in range(3000)]
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, body: Any = None) -> None:
+        self.status_code = status_code
+        self.body = body
+
+    def json(self) -> Any:
+        if self.body is None:
+            raise ValueError("No JSON body.")
+        return self.body
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(str(self.status_code))
+
+
+class _FakeSession:
+    """Records requests and fails for the configured nodes."""
+
+    def __init__(self, down: set[str], response: _FakeResponse | None = None) -> None:
+        self.down = down
+        self.response = response or _FakeResponse(200)
+        self.calls: list[str] = []
+        self.headers: list[dict[str, str]] = []
+
+    def post(self, url: str, **kwargs: Any) -> _FakeResponse:
+        self.calls.append(url)
+        self.headers.append(kwargs["headers"])
+        if any(url.startswith(node) for node in self.down):
+            raise requests.exceptions.ConnectionError(url)
+        return self.response
+
+
+class _BatchSession(_FakeSession):
+    """Answers each batch with one result per document it was sent."""
+
+    def __init__(self, down: set[str]) -> None:
+        super().__init__(down)
+        self.batches: list[tuple[str, list[str]]] = []
+
+    def post(self, url: str, **kwargs: Any) -> _FakeResponse:
+        super().post(url, **kwargs)
+        ids = [d["document_id"] for d in kwargs["json"]["documents"]]
+        self.batches.append((url.removesuffix("/api/v1/sync-batch"), ids))
+        results = [{"document_id": i} for i in ids]
+        return _FakeResponse(
+            200, {"results": results, "total_documents_processed": len(ids)}
+        )
+
+
+class TestHashRing:
+    """Test suite for HashRing."""
+
+    def test_same_key_same_node(self) -> None:
+        """Tests that routing is deterministic, including across instances."""
+        ring = HashRing(NODES)
+        assert [ring.node_for(k) for k in KEYS] == [
+            HashRing(list(reversed(NODES))).node_for(k) for k in KEYS
+        ]
+
+    def test_keys_spread_evenly(self) -> None:
+        """Tests that virtual nodes balance keys across nodes."""
+        counts = Counter(HashRing(NODES).node_for(k) for k in KEYS)
+        assert set(counts) == set(NODES)
+        assert min(counts.values()) > len(KEYS) / len(NODES) * 0.7
+
+    def test_join_moves_only_keys_to_new_node(self) -> None:
+        """Tests that a joining node only takes keys, never reshuffles others."""
+        ring = HashRing(NODES)
+        before = {k: ring.node_for(k) for k in KEYS}
+        ring.add_node("http://node-d:8000")
+        moved = [k for k in KEYS if ring.node_for(k) != before[k]]
+        assert all(ring.node_for(k) == "http://node-d:8000" for k in moved)
+        assert len(moved) < len(KEYS) / 3
+
+    def test_leave_moves_only_its_keys(self) -> None:
+        """Tests that a leaving node's keys are the only ones that move."""
+        ring = HashRing(NODES)
+        before = {k: ring.node_for(k) for k in KEYS}
+        ring.remove_node(NODES[0])
+        for k in KEYS:
+            if before[k] != NODES[0]:
+                assert ring.node_for(k) == before[k]
+
+    def test_nodes_for_lists_each_node_once(self) -> None:
+        """Tests the failover order for a key."""
+        ring = HashRing(NODES)
+        order = list(ring.nodes_for("doc-1"))
+        assert order[0] == ring.node_for("doc-1")
+        assert sorted(order) == sorted(NODES)
+
+    def test_empty_ring_raises(self) -> None:
+        """Tests that routing on an empty ring is an error."""
+        with pytest.raises(LookupError):
+            HashRing().node_for("doc-1")
+
+
+class TestCortexRouter:
+    """Test suite for CortexRouter."""
+
+    def _router(self, session: _FakeSession) -> CortexRouter:
+        return CortexRouter(
+            NODES, "key", session=cast(requests.Session, session), cooldown_seconds=60
+        )
+
+    def test_fails_over_to_next_node(self) -> None:
+        """Tests that a down node's documents go to the next node on the ring."""
+        probe = HashRing(NODES)
+        owner, fallback = list(probe.nodes_for("doc-1"))[:2]
+        session = _FakeSession(down={owner})
+        router = self._router(session)
+
+        router.sync_document({"document_id": "doc-1"})
+        assert session.calls == [f"{owner}/api/v1/sync", f"{fallback}/api/v1/sync"]
+
+        # The failed node is skipped directly while it cools down.
+        session.calls.clear()
+        router.sync_document({"document_id": "doc-1"})
+        assert session.calls == [f"{fallback}/api/v1/sync"]
+
+    def test_read_timeout_does_not_fail_over(self) -> None:
+        """Tests that a slow node is not treated as a down node."""
+
+        class _SlowSession(_FakeSession):
+            def post(self, url: str, **kwargs: Any) -> _FakeResponse:
+                self.calls.append(url)
+                raise requests.exceptions.ReadTimeout(url)
+
+        session = _SlowSession(down=set())
+        router = self._router(session)
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            router.sync_document({"document_id": "doc-1"})
+        assert len(session.calls) == 1
+        assert all(router.is_healthy(node) for node in NODES)
+
+    def test_connect_timeout_fails_over(self) -> None:
+        """Tests that a node that does not accept the connection is skipped."""
+
+        class _UnreachableSession(_FakeSession):
+            def post(self, url: str, **kwargs: Any) -> _FakeResponse:
+                self.calls.append(url)
+                if len(self.calls) == 1:
+                    raise requests.exceptions.ConnectTimeout(url)
+                return self.response
+
+        session = _UnreachableSession(down=set())
+        response = self._router(session).sync_document({"document_id": "doc-1"})
+        assert response.status_code == 200
+        assert len(session.calls) == 2
+
+    def test_raises_when_all_nodes_fail(self) -> None:
+        """Tests that the last error is raised when no node answers."""
+        router = self._router(_FakeSession(down=set(NODES)))
+        with pytest.raises(requests.exceptions.ConnectionError):
+            router.sync_document({"document_id": "doc-1"})
+
+    def test_sends_timeout_to_node(self) -> None:
+        """Tests that the node learns how long the router will wait."""
+        session = _FakeSession(down=set())
+        router = CortexRouter(
+            NODES, "key", timeout=2.5, session=cast(requests.Session, session)
+        )
+        router.sync_document({"document_id": "doc-1"})
+        assert session.headers[0]["X-Request-Timeout-Ms"] == "2500"
+        assert TIMEOUT_HEADER == deadlines.TIMEOUT_HEADER
+
+    def test_deadline_timeout_does_not_fail_over(self) -> None:
+        """Tests that a request's own deadline is not treated as a node failure."""
+        session = _FakeSession(
+            down=set(), response=_FakeResponse(504, {"error_code": 5040})
+        )
+        router = self._router(session)
+        response = router.sync_document({"document_id": "doc-1"})
+        assert response.status_code == 504
+        assert len(session.calls) == 1
+        assert all(router.is_healthy(node) for node in NODES)
+
+    def test_gateway_timeout_fails_over(self) -> None:
+        """Tests that a 504 from a proxy in front of a node still fails over."""
+        session = _FakeSession(down=set(), response=_FakeResponse(504))
+        router = self._router(session)
+        with pytest.raises(requests.exceptions.HTTPError):
+            router.sync_document({"document_id": "doc-1"})
+        assert len(session.calls) == len(NODES)
+
+    def test_sync_batch_splits_by_node(self) -> None:
+        """Tests that each node gets one batch holding only the documents it owns."""
+        session = _BatchSession(down=set())
+        documents = [{"document_id": k} for k in KEYS[:30]]
+        merged = self._router(session).sync_batch(documents)
+
+        probe = HashRing(NODES)
+        assert len(session.calls) == len(NODES)
+        for node, ids in session.batches:
+            assert all(probe.node_for(i) == node for i in ids)
+        assert [r["document_id"] for r in merged["results"]] == KEYS[:30]
+        assert merged["total_documents_processed"] == 30
+        assert "error" not in merged
+        assert all(TIMEOUT_HEADER not in h for h in session.headers)
+
+    def test_sync_batch_fails_over(self) -> None:
+        """Tests that a down node's batch goes to the next node on the ring."""
+        probe = HashRing(NODES)
+        owner, fallback = list(probe.nodes_for("doc-1"))[:2]
+        session = _BatchSession(down={owner})
+        documents = [{"document_id": k} for k in KEYS[:30]]
+        merged = self._router(session).sync_batch(documents)
+
+        assert f"{owner}/api/v1/sync-batch" in session.calls
+        assert any(node == fallback and "doc-1" in ids for node, ids in session.batches)
+        assert all(node != owner for node, _ in session.batches)
+        assert [r["document_id"] for r in merged["results"]] == KEYS[:30]
+
+    def test_sync_batch_keeps_partial_results(self) -> None:
+        """Tests that a node error is returned along with finished results."""
+        error = {"error_code": 5000, "message": "boom", "details": None}
+
+        class _FailingSession(_BatchSession):
+            def post(self, url: str, **kwargs: Any) -> _FakeResponse:
+                response = super().post(url, **kwargs)
+                return _FakeResponse(
+                    200,
+                    {
+                        "results": response.body["results"][:1],
+                        "total_documents_processed": 1,
+                        "error": error,
+                    },
+                )
+
+        documents = [{"document_id": k} for k in KEYS[:30]]
+        merged = self._router(_FailingSession(down=set())).sync_batch(documents)
+        assert merged["total_documents_processed"] == len(NODES)
+        assert merged["error"] == error
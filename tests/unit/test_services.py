@@ -0,0 +1,96 @@
+# Pylance strict mode
+from typing import Any
+
+from cortex_service import services
+from cortex_service.api_models import DocumentProcessRequest
+
+from .fakes import RecordingModel
+
+
+def _hierarchical_request(
+    content: str = "aaaabbbbccccdddd", parent_chunk_size: int = 8, **validation: Any
+) -> DocumentProcessRequest:
+    return DocumentProcessRequest.model_validate(
+        {
+            "document_id": "doc-h",
+            "content": content,
+            "chunking_strategy": {
+                "name": "hierarchical",
+                "params": {
+                    "parent_chunk_size": parent_chunk_size,
+                    "chunk_size": 4,
+                    "chunk_overlap": 0,
+                },
+            },
+            "validation": validation or {"level": "full"},
+        }
+    )
+
+
+class TestHierarchicalProcessing:
+    """Test suite for the hierarchical strategy."""
+
+    def test_layout_and_links(self, model: RecordingModel) -> None:
+        """Tests that each parent is followed by its linked children."""
+        response = services.process_document_logic(_hierarchical_request())
+        levels = [c.metadata.chunk_level for c in response.chunks]
+        assert levels == ["parent", "child", "child", "parent", "child", "child"]
+
+        first_parent, first_child = response.chunks[0], response.chunks[1]
+        assert first_child.metadata.parent_chunk_id == first_parent.chunk_id
+        assert first_parent.metadata.child_chunk_ids == [
+            response.chunks[1].chunk_id,
+            response.chunks[2].chunk_id,
+        ]
+
+    def test_single_encode_pass(self, model: RecordingModel) -> None:
+        """Tests that only children are encoded and parents are pooled."""
+        response = services.process_document_logic(_hierarchical_request())
+        assert model.encoded == ["aaaa", "bbbb", "cccc", "dddd"]
+
+        scores = [
+            c.metadata.validation.similarity_with_next_chunk for c in response.chunks
+        ]
+        # Children compare with the next child, parents with the next parent.
+        assert scores[0] is not None
+        assert scores[1] is not None and scores[2] is not None
+        assert scores[3] is None and scores[5] is None
+        assert response.validation_summary.total_pairs == 3
+
+    def test_sampled_parents_need_every_child(self, model: RecordingModel) -> None:
+        """Tests that a parent is not scored from a partial set of children."""
+        response = services.process_document_logic(
+            _hierarchical_request(
+                "aaaabbbbccccddddeeeeffff",
+                parent_chunk_size=12,
+                level="sampled",
+                sample_every=3,
+            )
+        )
+        # Pairs 0 and 3 are sampled, so each parent misses its last child.
+        assert model.encoded == ["aaaa", "bbbb", "dddd", "eeee"]
+        levels = [c.metadata.chunk_level for c in response.chunks]
+        assert levels == ["parent", "child", "child", "child"] * 2
+        scores = [
+            c.metadata.validation.similarity_with_next_chunk for c in response.chunks
+        ]
+        assert scores[1] is not None and scores[5] is not None
+        assert scores[0] is None
+
+    def test_sampled_parents_with_all_children(self, model: RecordingModel) -> None:
+        """Tests that parents are scored when sampling encoded all children."""
+        response = services.process_document_logic(
+            _hierarchical_request(level="sampled", sample_every=2)
+        )
+        assert model.encoded == ["aaaa", "bbbb", "cccc", "dddd"]
+        parent = response.chunks[0]
+        assert parent.metadata.validation.similarity_with_next_chunk is not None
+
+    def test_validation_none_skips_encoder(self, model: RecordingModel) -> None:
+        """Tests that parents are not scored when no child is encoded."""
+        response = services.process_document_logic(_hierarchical_request(level="none"))
+        assert model.encoded == []
+        assert all(
+            c.metadata.validation.similarity_with_next_chunk is None
+            for c in response.chunks
+        )
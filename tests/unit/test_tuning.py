@@ -0,0 +1,130 @@
+# Pylance strict mode
+import os
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cortex_service import tuning, validation
+from cortex_service.tuning import (
+    TuningProfile,
+    TuningResult,
+    load_profile,
+    profile_mismatch,
+    save_profile,
+    select_best,
+    synthetic_chunks,
+    thread_candidates,
+)
+
+
+def _result(batch_size: int, cps: float, latency_ms: float) -> TuningResult:
+    return TuningResult(
+        batch_size=batch_size,
+        intra_op_threads=1,
+        chunks_per_second=cps,
+        batch_latency_ms=latency_ms,
+    )
+
+
+class TestSelectBest:
+    """Test suite for select_best function."""
+
+    def test_highest_throughput_within_bound(self) -> None:
+        """Tests that the fastest candidate under the latency bound wins."""
+        results = [_result(8, 100, 50), _result(32, 200, 150), _result(128, 300, 900)]
+        assert select_best(results, latency_bound_ms=500).batch_size == 32
+
+    def test_lowest_latency_when_none_within_bound(self) -> None:
+        """Tests the fallback when no candidate meets the bound."""
+        results = [_result(32, 200, 150), _result(8, 100, 50)]
+        assert select_best(results, latency_bound_ms=10).batch_size == 8
+
+
+def test_thread_candidates() -> None:
+    """Tests that thread counts are powers of two plus the core count."""
+    assert thread_candidates(1) == [1]
+    assert thread_candidates(6) == [1, 2, 4, 6]
+    assert thread_candidates(8) == [1, 2, 4, 8]
+
+
+def test_synthetic_chunks_are_deterministic() -> None:
+    """Tests that benchmark input is reproducible and sized as requested."""
+    chunks = synthetic_chunks(4, 100)
+    assert chunks == synthetic_chunks(4, 100)
+    assert all(len(chunk) == 100 for chunk in chunks)
+
+
+def _profile(**overrides: Any) -> TuningProfile:
+    values: dict[str, Any] = {
+        "model": validation.DEFAULT_MODEL,
+        "batch_size": 64,
+        "intra_op_threads": 4,
+        "recommended_workers": 2,
+        "chunks_per_second": 123.4,
+        "batch_latency_ms": 56.7,
+        "latency_bound_ms": 500,
+        "cpu_count": os.cpu_count() or 1,
+        "created_at": datetime.now(UTC),
+        "results": [_result(64, 123.4, 56.7)],
+    }
+    return TuningProfile.model_validate(values | overrides)
+
+
+def test_profile_round_trip(tmp_path: Path) -> None:
+    """Tests that a saved profile loads back unchanged."""
+    path = str(tmp_path / "nested" / "profile.json")
+    assert load_profile(path) is None
+    profile = _profile()
+    save_profile(profile, path)
+    assert load_profile(path) == profile
+
+
+class TestConfigureFromEnv:
+    """Test suite for configure_from_env function."""
+
+    @pytest.fixture
+    def saved(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[str]:
+        """Records which profile was applied and whether calibration ran."""
+        path = str(tmp_path / "profile.json")
+        monkeypatch.setattr(tuning, "PROFILE_PATH", path)
+        monkeypatch.setattr(tuning, "load_profile", lambda: load_profile(path))
+        monkeypatch.setattr(tuning, "save_profile", lambda profile: None)
+        monkeypatch.setattr(tuning, "publish_settings", lambda *args: None)
+        events: list[str] = []
+        monkeypatch.setattr(
+            tuning, "apply_profile", lambda p: events.append(f"apply {p.model}")
+        )
+
+        def fake_calibrate() -> TuningProfile:
+            events.append("calibrate")
+            return _profile(model="calibrated")
+
+        monkeypatch.setattr(tuning, "calibrate", fake_calibrate)
+        save_profile(_profile(cpu_count=(os.cpu_count() or 1) + 1), path)
+        return events
+
+    def test_mismatched_profile_ignored_on_load(
+        self, saved: list[str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Tests that load mode keeps the defaults for a profile from another host."""
+        monkeypatch.setattr(tuning, "AUTOTUNE_MODE", "load")
+        tuning.configure_from_env()
+        assert saved == []
+
+    def test_mismatched_profile_recalibrated(
+        self, saved: list[str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Tests that calibrate mode replaces a profile from another host."""
+        monkeypatch.setattr(tuning, "AUTOTUNE_MODE", "calibrate")
+        tuning.configure_from_env()
+        assert saved == ["calibrate", "apply calibrated"]
+
+
+def test_profile_mismatch() -> None:
+    """Tests that a profile must match the default model and CPU count."""
+    assert profile_mismatch(_profile()) is None
+    assert "model" in (profile_mismatch(_profile(model="other-model")) or "")
+    cpus = (os.cpu_count() or 1) * 2
+    assert "CPUs" in (profile_mismatch(_profile(cpu_count=cpus)) or "")
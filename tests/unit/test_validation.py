@@ -0,0 +1,123 @@
+# Pylance strict mode
+from typing import Any
+
+import pytest
+from pydantic import ValidationError
+
+from cortex_service import validation
+from cortex_service.api_models import ValidationOptions
+from cortex_service.deadlines import Deadline, RequestCancelledError
+
+from .fakes import RecordingModel
+
+
+def _options(**kwargs: Any) -> ValidationOptions:
+    return ValidationOptions.model_validate(kwargs)
+
+
+class TestSelectPairs:
+    """Test suite for select_pairs function."""
+
+    def test_full_and_none(self) -> None:
+        """Tests that full scores everything and none scores nothing."""
+        assert validation.select_pairs(5, _options(level="full"), "doc") is None
+        assert validation.select_pairs(5, _options(level="none"), "doc") == []
+
+    def test_sample_every(self) -> None:
+        """Tests scoring every k-th pair, with a default k."""
+        every_3 = _options(level="sampled", sample_every=3)
+        assert validation.select_pairs(10, every_3, "doc") == [0, 3, 6, 9]
+        default = _options(level="sampled")
+        assert validation.select_pairs(25, default, "doc") == [0, 10, 20]
+
+    def test_sample_fraction_is_stable(self) -> None:
+        """Tests that random sampling is repeatable per document."""
+        options = _options(level="sampled", sample_fraction=0.25)
+        pairs = validation.select_pairs(100, options, "doc-1")
+        assert pairs is not None and len(pairs) == 25
+        assert pairs == validation.select_pairs(100, options, "doc-1")
+
+
+class TestValidationOptions:
+    """Test suite for ValidationOptions."""
+
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {"level": "sampled", "sample_every": 3, "sample_fraction": 0.5},
+            {"level": "full", "sample_every": 3},
+            {"level": "none", "sample_fraction": 0.5},
+        ],
+    )
+    def test_rejects_ignored_sampling(self, options: dict[str, Any]) -> None:
+        """Tests that sampling parameters that would be ignored are rejected."""
+        with pytest.raises(ValidationError):
+            ValidationOptions.model_validate(options)
+
+
+class TestCalculateSemanticSimilarity:
+    """Test suite for calculate_semantic_similarity function."""
+
+    def test_full(self, model: RecordingModel) -> None:
+        """Tests that every adjacent pair is scored."""
+        scores = validation.calculate_semantic_similarity(["a", "bb", "ccc"])
+        assert [s is not None for s in scores] == [True, True, False]
+        assert model.encoded == ["a", "bb", "ccc"]
+
+    def test_only_needed_chunks_are_encoded(self, model: RecordingModel) -> None:
+        """Tests that sampled pairs only encode the chunks they compare."""
+        chunks = ["a", "bb", "ccc", "dddd", "eeeee"]
+        scores = validation.calculate_semantic_similarity(chunks, pairs=[2])
+        assert scores[:2] == [None, None]
+        assert scores[2] is not None
+        assert scores[3:] == [None, None]
+        assert model.encoded == ["ccc", "dddd"]
+
+    def test_no_pairs_skips_encoder(self, model: RecordingModel) -> None:
+        """Tests that an empty pair list never calls the encoder."""
+        scores = validation.calculate_semantic_similarity(["a", "bb"], pairs=[])
+        assert scores == [None, None]
+        assert model.encoded == []
+
+
+def test_cached_chunks_are_not_encoded_again(model: RecordingModel) -> None:
+    """Tests that only new chunks reach the encoder on a repeated sync."""
+    validation.calculate_semantic_similarity(["a", "bb", "ccc"])
+    model.encoded.clear()
+    scores = validation.calculate_semantic_similarity(["a", "bb", "dddd"])
+    assert model.encoded == ["dddd"]
+    assert scores[0] is not None and scores[1] is not None
+
+
+def test_encoding_stops_between_batches(
+    model: RecordingModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that a cancelled request stops before its next encode batch."""
+    monkeypatch.setattr(validation, "ENCODE_BATCH_SIZE", 2)
+    deadline = Deadline(60)
+    encode = model.encode
+
+    def encode_then_cancel(chunks: list[str], **kwargs: Any) -> Any:
+        deadline.cancel()
+        return encode(chunks, **kwargs)
+
+    monkeypatch.setattr(model, "encode", encode_then_cancel)
+    chunks = ["a", "bb", "ccc", "dddd", "eeeee"]
+    with pytest.raises(RequestCancelledError):
+        validation.embed_chunks(chunks, list(range(5)), deadline=deadline)
+    assert model.encoded == ["a", "bb"]
+
+    # The finished batch is cached for a retry.
+    model.encoded.clear()
+    validation.embed_chunks(chunks, list(range(5)))
+    assert model.encoded == ["ccc", "dddd", "eeeee"]
+
+
+def test_summarize() -> None:
+    """Tests the summary statistics over calculated scores."""
+    summary = validation.summarize([0.5, None, 1.0, None], "sampled")
+    assert summary.scored_pairs == 2
+    assert summary.total_pairs == 3
+    assert summary.mean_similarity == 0.75
+    assert summary.min_similarity == 0.5
+    assert summary.max_similarity == 1.0